@@ -14,11 +14,28 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 global districts
-global travel_cache
+global travel_matrix
+global public_isochrones
+global travel_time_surrogate
 global tom_tom
 global savings_cache
 
 
+@app.route("/stats", methods=["GET"])
+def stats():
+    return jsonify(
+        {
+            "rate_limiters": get_rate_limiter_stats(),
+            "journey_cache": get_journey_cache().stats(),
+            "single_flight": get_single_flight_stats(),
+            "tom_tom": [
+                tom_tom.stats()
+                for tom_tom in (walk_tom_tom, drive_tom_tom, bike_tom_tom)
+            ],
+        }
+    )
+
+
 @app.route("/predict", methods=["POST"])
 def predict():
     try:
@@ -97,6 +114,9 @@ def plan():
                 workplace_longitude,
                 districts,
                 max_travel_time,
+                travel_matrix=travel_matrix,
+                isochrones=public_isochrones,
+                surrogate=travel_time_surrogate,
             )
         elif transport_mode == "drive":
             filtered_districts = drive_tom_tom.filter_districts_within_time(
@@ -158,6 +178,10 @@ if __name__ == "__main__":
         logging.info("Districts data found, loading from file")
         districts = pickle.load(open("districts.pkl", "rb"))
     logging.info(f"Loaded {len(districts)} districts")
+    build_burrough_index(districts)
+    # the reverse geocoder queries the shared spatial index, so build that first
+    build_district_spatial_index(districts)
+    build_reverse_geocoder(districts)
 
     # pre-load savings cache
     if not os.path.exists("savings_cache.pkl"):
@@ -168,27 +192,35 @@ if __name__ == "__main__":
         savings_cache = pickle.load(open("savings_cache.pkl", "rb"))
     logging.info(f"Loaded {len(savings_cache)} savings cache entries")
 
+    # pre-load rent data
+    get_rent_index()
+
     logging.info("Initialising TomTom")
-    walk_tom_tom = TomTom(mode="walk", mock=True)
-    drive_tom_tom = TomTom(mode="drive", mock=True)
-    bike_tom_tom = TomTom(mode="bike", mock=True)
+    walk_tom_tom = TomTom(mode="walk", mock=True, districts=districts)
+    drive_tom_tom = TomTom(mode="drive", mock=True, districts=districts)
+    bike_tom_tom = TomTom(mode="bike", mock=True, districts=districts)
     logging.info("TomTom initialised")
 
-    # pre-load travel cache
-    # if not os.path.exists('travel_cache.pkl'):
-    #     logging.info("Travel cache not found, initialising")
-    #     travel_cache = get_all_distances(districts)
-    # else:
-    #     logging.info("Travel cache found, loading from file")
-    #     travel_cache = pickle.load(open('travel_cache.pkl', 'rb'))
-    # logging.info(f"Loaded {len(travel_cache)} travel cache entries")
-    # if not os.path.exists('travel_cache.pkl'):
-    #     logging.info("Travel cache not found, initialising")
-    #     travel_cache = get_all_distances(districts)
-    # else:
-    #     logging.info("Travel cache found, loading from file")
-    #     travel_cache = pickle.load(open('travel_cache.pkl', 'rb'))
-    # logging.info(f"Loaded {len(travel_cache)} travel cache entries")
+    # pre-load travel matrix, built offline with `python -m utils.travel_matrix`
+    travel_matrix = load_travel_matrix(districts)
+    public_isochrones = None
+    if travel_matrix is None:
+        logging.info("Travel matrix not found, journeys will be fetched from TfL")
+    else:
+        logging.info(f"Loaded travel matrix for {len(travel_matrix.keys)} districts")
+        public_isochrones = IsochroneIndex.from_travel_matrix(travel_matrix)
+
+    # train the public transport travel time surrogate on the journeys seen so far
+    travel_time_surrogate = TravelTimeSurrogate.train(
+        districts,
+        collect_observed_journeys(districts, travel_matrix, get_journey_cache()),
+    )
+
+    # precompute sorted isochrones so travel time filters are a binary search
+    logging.info("Loading isochrones")
+    drive_tom_tom.load_isochrones(districts)
+    bike_tom_tom.load_isochrones(districts)
+    logging.info("Isochrones loaded")
 
     try:
         app.run(debug=True)
@@ -3,19 +3,77 @@ import osmnx as ox
 import os
 import numpy as np
 import pathlib
+import threading
+from collections import OrderedDict
 from typing import Literal, Dict, Optional
 from shapely.geometry import Point
-from functools import lru_cache
+
+from .district_index import get_district_spatial_index, haversine_km
+from .isochrones import load_or_build_isochrones
+from .road_graph import load_road_graph, save_array_atomic
+from .speed_profiles import DEFAULT_SPEEDS
 
 ox.settings.use_cache = False  # dont cache http requests
 
 
+ROUTE_CACHE_SIZE = 1024
+
+
 class PathFindingError(Exception):
     pass
 
 
+class RouteCache:
+    """
+    LRU of (start node, end node) -> (seconds, minutes, route) for one TomTom.
+    Full routes are only kept when store_routes is set; lookups that need a
+    route the cache did not keep count as misses.
+    """
+
+    def __init__(self, max_size=ROUTE_CACHE_SIZE, store_routes=False):
+        self.max_size = max_size
+        self.store_routes = store_routes
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, with_route=False):
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None and (not with_route or entry[2] is not None):
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+            return None
+
+    def put(self, key, seconds, minutes, route=None):
+        entry = (seconds, minutes, route if self.store_routes else None)
+        with self._lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        return entry
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "store_routes": self.store_routes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
 class TomTom:
-    default_speed = {"drive": 30.0, "walk": 3.4, "bike": 17.0}
+    default_speed = DEFAULT_SPEEDS
 
     def __init__(
         self,
@@ -23,8 +81,16 @@ class TomTom:
         mode: Literal["drive", "walk", "bike"] = "walk",
         speed: Optional[float] = None,
         mock=False,
+        districts=None,
+        route_cache_size=ROUTE_CACHE_SIZE,
+        store_routes=False,
     ):
         self.mock = mock
+        self.route_cache = RouteCache(route_cache_size, store_routes)
+        self.isochrones = None
+        self.isochrones_fingerprint = None
+        self.district_nodes = None
+        self.district_nodes_fingerprint = None
         self.speed = self.default_speed[mode] if speed == None else speed
         self.mode = mode
         print(
@@ -32,9 +98,8 @@ class TomTom:
         )
         if self.mock:
             return
-        self.G = None
-        self.nodes = None
-        self.nodes_kdtree = None
+        self.graph = None
+        self._nodes_kdtree = None
 
         cache_path = pathlib.Path(__file__).parent.resolve() / "map_cache"
         os.makedirs(cache_path, exist_ok=True)
@@ -44,117 +109,228 @@ class TomTom:
             f"{cache_path}/{place_name.replace(' ', '').lower()}-{mode}.graphml"
         )
         try:
+            G = None
             if os.path.exists(cache_file):
                 print("Loading from cache...")
-                self.G = ox.load_graphml(cache_file)
-                print("Loaded graph from cache")
             else:
                 print("Downloading map data...")
-                self.G = ox.graph_from_place(
-                    place_name, network_type=mode, simplify=True
-                )
+                G = ox.graph_from_place(place_name, network_type=mode, simplify=True)
                 print("Saving to cache...")
-                ox.save_graphml(self.G, cache_file)
+                ox.save_graphml(G, cache_file)
 
-            # Prepare nodes for routing
-            self.nodes = ox.graph_to_gdfs(self.G, edges=False)
-            node_coords = np.array(
-                [[node["y"], node["x"]] for _, node in self.nodes.iterrows()]
+            # Route on compact CSR arrays loaded from the binary graph cache, the
+            # graphml is only parsed when that cache is missing or stale
+            # edges are weighted by travel seconds at this mode's speed profile
+            self.graph = load_road_graph(cache_file, G, mode)
+            del G
+            print(
+                f"Routing graph has {len(self.graph)} nodes and {self.graph.n_edges} edges"
             )
-            # print(f"Nodes: {(node_coords)}")
-            self.nodes_kdtree = KDTree(node_coords)
+            if districts is not None:
+                # snap every district centroid up front, or map the snap table
+                self.get_district_nodes(districts)
         except Exception as e:
             print(f"Error during initialization: {str(e)}")
             raise
 
-    @lru_cache(1024)
-    def _find_shortest_path(self, start_node, end_node):
-        return ox.shortest_path(self.G, start_node, end_node, weight="length")
+    def _find_shortest_path(self, start_node, end_node, with_route=False):
+        """
+        (seconds, minutes, route) between two node positions in self.graph, route
+        only when with_route or the cache stores routes. seconds is np.inf if there
+        is no route.
+        """
+        key = (start_node, end_node)
+        entry = self.route_cache.get(key, with_route)
+        if entry is not None:
+            return entry
+        result = self.graph.shortest_path(start_node, end_node)
+        if result is None:
+            return self.route_cache.put(key, np.inf, np.inf)
+        seconds, route = result
+        entry = self.route_cache.put(
+            key, seconds, int(self.seconds_to_minutes(seconds)), route
+        )
+        return entry if not with_route else (*entry[:2], route)
 
-    def calculate_route(self, start, end):
+    def _route(self, start, end, with_route=False):
         start_node = self._find_nearest_node(start)
         end_node = self._find_nearest_node(end)
         # print(f"Start node: {start_node}, End node: {end_node}")
-        route = self._find_shortest_path(start_node, end_node)
-        if route is None:
+        entry = self._find_shortest_path(start_node, end_node, with_route)
+        if not np.isfinite(entry[0]):
             raise PathFindingError(
                 f"Failed on {self.mode} with start={start} and end={end}"
             )
-        return route
+        return entry
+
+    def calculate_route(self, start, end):
+        """OSM node ids along the shortest route"""
+        _, _, route = self._route(start, end, with_route=True)
+        return self.graph.node_ids[route].tolist()
 
     def calculate_route_time(self, start, end):
-        route = self.calculate_route(start, end)
-        length = sum(
-            self.G.edges[route[i], route[i + 1], 0]["length"]
-            for i in range(len(route) - 1)
-        )
-        if length == 0:
+        seconds, minutes, _ = self._route(start, end)
+        if seconds == 0:
             raise Exception(f"Route length is zero")
-        return self.km_to_minutes(length)
+        return minutes
 
-    def _find_nearest_node(self, coords: Point):
-        """Find the nearest node to given coordinates."""
+    def stats(self):
+        return {
+            "mode": self.mode,
+            "mock": self.mock,
+            "route_cache": self.route_cache.stats(),
+        }
+
+    @property
+    def nodes_kdtree(self):
+        # only built when a point outside the district snap table is routed
+        if self._nodes_kdtree is None:
+            self._nodes_kdtree = KDTree(
+                np.column_stack([self.graph.lats, self.graph.lons])
+            )
+        return self._nodes_kdtree
+
+    def snap_points(self, lats, lons):
+        """
+        Positions in self.graph of the nearest node to each point, in one KD-tree
+        query. self.graph.node_ids[positions] gives their OSM ids.
+        """
         try:
-            _, index = self.nodes_kdtree.query([coords.y, coords.x], k=1)
-            return list(self.nodes.index)[index]
+            _, index = self.nodes_kdtree.query(
+                np.column_stack([np.atleast_1d(lats), np.atleast_1d(lons)]), k=1
+            )
+            return index.astype(np.int64)
         except Exception as e:
             raise PathFindingError(f"Error finding nearest node {e}")
 
-    def km_to_minutes(self, meters):
-        return round((meters * 60 / self.speed) / 1000)
+    def _find_nearest_node(self, coords: Point):
+        """Find the position in self.graph of the nearest node to given coordinates."""
+        return int(self.snap_points(coords.y, coords.x)[0])
 
-    def euclidean_distance(self, start, end):
-        return np.sqrt((start.x - end.x) ** 2 + (start.y - end.y) ** 2)
+    def get_district_nodes(self, districts):
+        """Graph node nearest to each district centroid, in DistrictSpatialIndex order"""
+        district_index = get_district_spatial_index(districts)
+        if self.district_nodes_fingerprint != district_index.fingerprint:
+            snap_file = None
+            if self.graph.cache_dir is not None:
+                snap_file = (
+                    self.graph.cache_dir
+                    / f"districts-{district_index.fingerprint[:12]}.npy"
+                )
+            if snap_file is not None and snap_file.exists():
+                self.district_nodes = np.load(snap_file, mmap_mode="r")
+            else:
+                self.district_nodes = self.snap_points(
+                    district_index.coords[:, 0], district_index.coords[:, 1]
+                )
+                if snap_file is not None:
+                    save_array_atomic(snap_file, self.district_nodes)
+            self.district_nodes_fingerprint = district_index.fingerprint
+        return district_index, self.district_nodes
+
+    def route_seconds_to(self, target_node, cutoff=None):
+        """
+        Fastest route in travel seconds to target_node from every graph node,
+        np.inf beyond cutoff seconds, from a single Dijkstra over the reversed graph
+        """
+        return self.graph.distances(
+            target_node, limit=np.inf if cutoff is None else cutoff, reverse=True
+        )
+
+    def seconds_to_minutes(self, seconds):
+        """
+        Route travel seconds, at the speed profile of the mode, in whole minutes
+        with every speed scaled by self.speed / default speed
+        """
+        return np.round(seconds * self.default_speed[self.mode] / self.speed / 60)
+
+    def minutes_to_seconds(self, minutes):
+        return minutes * 60 * self.speed / self.default_speed[self.mode]
+
+    def compute_travel_minutes(self, districts):
+        """
+        Travel minutes between every pair of districts, row = workplace district,
+        np.inf where no route was found
+        """
+        if self.mock:
+            coords = get_district_spatial_index(districts).coords
+            return self._mock_travel_minutes(
+                coords[:, None, 0],
+                coords[:, None, 1],
+                coords[None, :, 0],
+                coords[None, :, 1],
+            ).astype(np.float32)
+
+        district_index, district_nodes = self.get_district_nodes(districts)
+        minutes = np.full((len(district_nodes),) * 2, np.inf, dtype=np.float32)
+        for i, workplace_node in enumerate(district_nodes):
+            seconds = self.route_seconds_to(workplace_node)[district_nodes]
+            reachable = np.isfinite(seconds)
+            minutes[i, reachable] = self.seconds_to_minutes(seconds[reachable])
+        return minutes
+
+    def load_isochrones(self, districts):
+        """
+        Precompute (or load from the graph's cache directory, or map_cache when
+        mocked) the sorted per-district isochrones
+        """
+        self.isochrones = load_or_build_isochrones(
+            f"{self.mode}{'-mock' if self.mock else ''}-{self.speed:g}",
+            districts,
+            lambda keys: self.compute_travel_minutes(districts),
+            None if self.mock else self.graph.cache_dir,
+        )
+        self.isochrones_fingerprint = get_district_spatial_index(districts).fingerprint
+        return self.isochrones
+
+    def _mock_travel_minutes(self, lat1, lng1, lat2, lng2):
+        """Vectorized haversine distance converted to minutes at self.speed"""
+        return np.round(haversine_km(lat1, lng1, lat2, lng2) * 60 / self.speed)
 
     def filter_districts_within_time(
         self, workplace_district, districts, max_travel_time
     ):
-        filtered_districts = {}
-        for district in districts:
-            if self.mock:
-                travel_time = self.euclidean_distance(
-                    Point(
-                        districts[district]["longitude"],
-                        districts[district]["latitude"],
-                    ),
-                    Point(
-                        districts[workplace_district]["longitude"],
-                        districts[workplace_district]["latitude"],
-                    ),
-                )
+        # Answer from the precomputed isochrones when they cover this district set
+        if (
+            self.isochrones is not None
+            and workplace_district in self.isochrones
+            and self.isochrones_fingerprint
+            == get_district_spatial_index(districts).fingerprint
+        ):
+            return self.isochrones.reachable(workplace_district, max_travel_time)
 
-                # Convert lng/lat distance to meters using haversine formula
-                R = 6371000  # Earth's radius in meters
-                lat1 = districts[district]["latitude"]
-                lat2 = districts[workplace_district]["latitude"]
-                lng1 = districts[district]["longitude"]
-                lng2 = districts[workplace_district]["longitude"]
-
-                dlat = np.radians(lat2 - lat1)
-                dlng = np.radians(lng2 - lng1)
-
-                a = np.sin(dlat / 2) * np.sin(dlat / 2) + np.cos(
-                    np.radians(lat1)
-                ) * np.cos(np.radians(lat2)) * np.sin(dlng / 2) * np.sin(dlng / 2)
-                c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
-                travel_time = R * c  # Distance in meters
-
-                travel_time = self.km_to_minutes(travel_time)
-                if travel_time <= max_travel_time:
-                    filtered_districts[district] = travel_time
-            else:
-                travel_time = self.calculate_route_time(
-                    Point(
-                        districts[district]["longitude"],
-                        districts[district]["latitude"],
-                    ),
-                    Point(
-                        districts[workplace_district]["longitude"],
-                        districts[workplace_district]["latitude"],
-                    ),
+        if self.mock:
+            # One vectorized pass over the shared centroid array
+            district_index = get_district_spatial_index(districts)
+            coords = district_index.coords
+            workplace_coords = district_index.get_coords(workplace_district)
+            travel_times = self._mock_travel_minutes(
+                coords[:, 0], coords[:, 1], workplace_coords[0], workplace_coords[1]
+            )
+            mask = travel_times <= max_travel_time
+            return dict(
+                zip(
+                    district_index.keys[mask].tolist(),
+                    travel_times[mask].astype(int).tolist(),
                 )
-                if travel_time <= max_travel_time:
-                    filtered_districts[district] = travel_time
+            )
+
+        # One Dijkstra from the workplace, cut off at the longest time that could
+        # still round down to max_travel_time, answers every district
+        district_index, district_nodes = self.get_district_nodes(districts)
+        workplace_node = district_nodes[district_index.positions[workplace_district]]
+        seconds = self.route_seconds_to(
+            workplace_node, cutoff=self.minutes_to_seconds(max_travel_time + 0.5)
+        )
+        seconds = seconds[district_nodes]
+        reachable = np.isfinite(seconds)
+        filtered_districts = {}
+        for district, travel_time in zip(
+            district_index.keys[reachable].tolist(),
+            self.seconds_to_minutes(seconds[reachable]).astype(int).tolist(),
+        ):
+            if travel_time <= max_travel_time:
+                filtered_districts[district] = travel_time
         return filtered_districts
 
 
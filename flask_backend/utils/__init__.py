@@ -1,6 +1,16 @@
-from .rent_reader import get_rent_by_district, get_district_names, get_district_from_coords, get_rent_range
+from .rent_reader import get_rent_by_district, get_district_names, get_district_from_coords, get_rent_range, get_rent_index, RentIndex, build_burrough_index, get_burrough_by_district, get_districts_from_coords
+from .reverse_geocoder import ReverseGeocoder, build_reverse_geocoder
+from .borough_lookup import BoroughIndex, boroughs_for_points
+from .travel_matrix import TravelMatrix, build_travel_matrix, load_travel_matrix
+from .rate_limiter import RateLimitExceeded, TokenBucket, get_rate_limiter, get_rate_limiter_stats
+from .tfl_client import TfLClient, JourneyError, get_tfl_client
+from .isochrones import IsochroneIndex
+from .road_graph import RoadGraph
+from .single_flight import SingleFlight, single_flight, get_single_flight_stats
+from .travel_time_surrogate import TravelTimeSurrogate, collect_observed_journeys
+from .district_index import DistrictSpatialIndex, build_district_spatial_index, get_district_spatial_index
 from .coords_converter import get_postcodes_by_coordinates, get_all_districts
-from .public_transport_reader import filter_districts_by_distance, get_all_distances
+from .public_transport_reader import filter_districts_by_distance, get_all_distances, JourneyCache, get_journey_cache
 from .savings_predictor import predict_savings
 from .bills import predict_bills
 from .TomTom import TomTom, Point
@@ -17,5 +27,36 @@ __all__ = [
     'predict_bills',
     'TomTom',
     'Point',
-    'get_rent_range'
+    'get_rent_range',
+    'get_rent_index',
+    'RentIndex',
+    'build_burrough_index',
+    'get_burrough_by_district',
+    'get_districts_from_coords',
+    'ReverseGeocoder',
+    'build_reverse_geocoder',
+    'BoroughIndex',
+    'boroughs_for_points',
+    'DistrictSpatialIndex',
+    'build_district_spatial_index',
+    'get_district_spatial_index',
+    'TravelMatrix',
+    'build_travel_matrix',
+    'load_travel_matrix',
+    'RateLimitExceeded',
+    'TokenBucket',
+    'get_rate_limiter',
+    'get_rate_limiter_stats',
+    'TfLClient',
+    'JourneyError',
+    'get_tfl_client',
+    'JourneyCache',
+    'get_journey_cache',
+    'IsochroneIndex',
+    'SingleFlight',
+    'single_flight',
+    'get_single_flight_stats',
+    'TravelTimeSurrogate',
+    'collect_observed_journeys',
+    'RoadGraph'
 ]
\ No newline at end of file
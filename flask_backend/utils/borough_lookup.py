@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+import logging
+import threading
+
+import shapely
+from pyproj import Transformer
+from shapely.strtree import STRtree
+
+BOROUGH_COORDS_PATH = "data/borough_coords.csv"
+
+# borough_coords.csv uses short names, postcodes.io and the rent data use the full ones
+BOROUGH_ALIASES = {
+    "Kingston": "Kingston upon Thames",
+    "Richmond": "Richmond upon Thames",
+}
+
+
+def normalise_borough_name(name):
+    name = name.replace(" & ", " and ")
+    return BOROUGH_ALIASES.get(name, name)
+
+
+class BoroughIndex:
+    """
+    Borough boundary polygons built once from borough_coords.csv (British National
+    Grid vertices) and held in an STRtree for point-in-polygon lookups.
+    """
+
+    def __init__(self, file_path=BOROUGH_COORDS_PATH):
+        data = pd.read_csv(file_path)
+
+        # convert every vertex to WGS84 in a single transform
+        transformer = Transformer.from_crs("EPSG:27700", "EPSG:4326", always_xy=True)
+        lons, lats = transformer.transform(data["x"].to_numpy(), data["y"].to_numpy())
+
+        names = data["borough"].to_numpy()
+        # vertices are stored borough by borough; blank rows separate the rings
+        valid = np.isfinite(lons) & np.isfinite(lats)
+        new_ring = np.r_[True, (names[1:] != names[:-1]) | ~valid[:-1]]
+        ring_ids = np.cumsum(new_ring)[valid]
+        lons, lats, names = lons[valid], lats[valid], names[valid]
+        starts = np.flatnonzero(np.r_[True, ring_ids[1:] != ring_ids[:-1]])
+        ends = np.r_[starts[1:], len(ring_ids)]
+
+        rings = {}
+        for start, end in zip(starts, ends):
+            if end - start < 3:
+                continue
+            ring = shapely.Polygon(np.column_stack([lons[start:end], lats[start:end]]))
+            rings.setdefault(names[start], []).append(ring)
+
+        polygons = []
+        for rings_for_borough in rings.values():
+            polygon = shapely.union_all(
+                [
+                    ring if ring.is_valid else shapely.make_valid(ring)
+                    for ring in rings_for_borough
+                ]
+            )
+            polygons.append(polygon)
+
+        self.boroughs = np.array(
+            [normalise_borough_name(name) for name in rings], dtype=object
+        )
+        self.polygons = polygons
+        self.tree = STRtree(polygons)
+
+    def boroughs_for_points(self, lats, lons):
+        """
+        Return the borough containing each point, or None for points outside
+        every borough, resolving the whole batch with one tree query.
+        """
+        points = shapely.points(
+            np.asarray(lons, dtype=float), np.asarray(lats, dtype=float)
+        )
+        result = np.full(len(points), None, dtype=object)
+        point_indices, polygon_indices = self.tree.query(points, predicate="within")
+        result[point_indices] = self.boroughs[polygon_indices]
+        return result
+
+
+_borough_index = None
+_borough_index_lock = threading.Lock()
+
+
+def get_borough_index():
+    """Return the shared BoroughIndex, building it on first use"""
+    global _borough_index
+    if _borough_index is None:
+        with _borough_index_lock:
+            if _borough_index is None:
+                _borough_index = BoroughIndex()
+                logging.info(
+                    f"Built borough index with {len(_borough_index.boroughs)} boroughs"
+                )
+    return _borough_index
+
+
+def boroughs_for_points(lats, lons):
+    return get_borough_index().boroughs_for_points(lats, lons)
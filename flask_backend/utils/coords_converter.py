@@ -1,6 +1,9 @@
 import requests
 import logging
 
+from .rate_limiter import get_rate_limiter
+from .single_flight import single_flight
+
 
 
 def get_postcodes_by_coordinates(latitude: float, longitude: float, radius: int = 400) -> dict:
@@ -21,6 +24,7 @@ def get_postcodes_by_coordinates(latitude: float, longitude: float, radius: int
         "radius": radius
     }
     
+    get_rate_limiter("postcodes").acquire()
     response = requests.get(url, params=params)
     response.raise_for_status()  # Raise exception for bad status codes
     return response.json()
@@ -31,8 +35,10 @@ def format_list_field(field: list) -> str:
         return "None"
     return ", ".join(field)
 
+@single_flight("postcodes_outcode")
 def get_district_coords(district: str) -> dict:
     url = f"https://api.postcodes.io/outcodes/{district}"
+    get_rate_limiter("postcodes").acquire()
     response = requests.get(url)
     response.raise_for_status()  # Raise exception for bad status codes
     try:
@@ -0,0 +1,114 @@
+import numpy as np
+import hashlib
+import logging
+import threading
+
+from sklearn.neighbors import BallTree
+
+EARTH_RADIUS_KM = 6371.0
+DISTRICTS_PATH = "districts.pkl"
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Vectorized great-circle distance in km between (lat, lon) points in degrees"""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def get_districts_fingerprint(districts):
+    """Hash of the district keys and centroids, used to tell district sets apart"""
+    sha = hashlib.sha1()
+    for key in sorted(districts.keys()):
+        data = districts[key]
+        sha.update(f"{key},{data['latitude']},{data['longitude']};".encode())
+    return sha.hexdigest()
+
+
+class DistrictSpatialIndex:
+    """
+    District centroids held as one contiguous (lat, lon) array with a parallel key
+    array, plus a haversine BallTree over them. Built once and shared by every
+    transport mode.
+    """
+
+    def __init__(self, districts):
+        self.districts = districts
+        self.fingerprint = get_districts_fingerprint(districts)
+        self.keys = np.array(list(districts.keys()), dtype=object)
+        self.coords = np.ascontiguousarray(
+            [
+                [float(data["latitude"]), float(data["longitude"])]
+                for data in districts.values()
+            ],
+            dtype=np.float64,
+        )
+        self.positions = {key: i for i, key in enumerate(self.keys)}
+        self.tree = BallTree(np.radians(self.coords), metric="haversine")
+
+    def __len__(self):
+        return len(self.keys)
+
+    def get_coords(self, district):
+        return self.coords[self.positions[district]]
+
+    def nearest(self, latitude, longitude, k):
+        """Return the keys of the k districts nearest to the given point"""
+        k = min(k, len(self.keys))
+        _, indices = self.tree.query(np.radians([[latitude, longitude]]), k=k)
+        return self.keys[indices[0]].tolist()
+
+    def within_radius(self, latitude, longitude, radius_km, limit=None):
+        """
+        Return (key, distance in km) for every district within radius_km of the point,
+        nearest first, keeping at most limit of them
+        """
+        indices, distances = self.tree.query_radius(
+            np.radians([[latitude, longitude]]),
+            r=radius_km / EARTH_RADIUS_KM,
+            return_distance=True,
+            sort_results=True,
+        )
+        indices, distances = indices[0][:limit], distances[0][:limit]
+        return list(
+            zip(self.keys[indices].tolist(), (distances * EARTH_RADIUS_KM).tolist())
+        )
+
+
+_district_index = None
+_district_index_lock = threading.Lock()
+
+
+def build_district_spatial_index(districts):
+    """Build the shared DistrictSpatialIndex, replacing any previously built one"""
+    global _district_index
+    _district_index = DistrictSpatialIndex(districts)
+    logging.info(
+        f"Built district spatial index for {len(districts)} districts ({_district_index.fingerprint[:8]})"
+    )
+    return _district_index
+
+
+def get_district_spatial_index(districts):
+    """
+    Return the shared DistrictSpatialIndex for this district set, rebuilding it only
+    when the districts differ from the ones it was built from
+    """
+    district_index = _district_index
+    if (
+        district_index is not None
+        and district_index.districts is districts
+        and len(district_index) == len(districts)
+    ):
+        return district_index
+    with _district_index_lock:
+        if (
+            _district_index is None
+            or _district_index.fingerprint != get_districts_fingerprint(districts)
+        ):
+            return build_district_spatial_index(districts)
+        _district_index.districts = districts
+        return _district_index
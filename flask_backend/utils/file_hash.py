@@ -0,0 +1,10 @@
+import hashlib
+
+
+def get_file_hash(file_path):
+    """sha256 of a file's contents, read in 1 MB chunks"""
+    sha = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
@@ -0,0 +1,85 @@
+import numpy as np
+import logging
+import os
+import pathlib
+
+from .district_index import get_districts_fingerprint
+from .travel_matrix import NO_JOURNEY, NOT_COMPUTED
+
+
+class IsochroneIndex:
+    """
+    For every workplace district, all districts sorted by travel time to it.
+    A max_travel_time query is then a binary search for the cut-off plus a slice.
+    """
+
+    def __init__(self, keys, minutes, origins=None):
+        """
+        keys: the N district keys
+        minutes: travel times, one row per workplace district and one column per
+        district in keys, np.inf if unreachable
+        origins: the workplace district of each row, keys by default
+        """
+        self.keys = np.asarray(keys, dtype=object)
+        origins = self.keys if origins is None else np.asarray(origins, dtype=object)
+        self.positions = {key: i for i, key in enumerate(origins.tolist())}
+        minutes = np.asarray(minutes, dtype=np.float32)
+        self.order = np.argsort(minutes, axis=1, kind="stable").astype(np.int32)
+        self.sorted_minutes = np.take_along_axis(minutes, self.order, axis=1)
+
+    def __contains__(self, district):
+        return district in self.positions
+
+    def reachable(self, district, max_travel_time):
+        """Return {district: minutes} for every district reachable within max_travel_time"""
+        i = self.positions[district]
+        cut = np.searchsorted(
+            self.sorted_minutes[i], float(max_travel_time), side="right"
+        )
+        return dict(
+            zip(
+                self.keys[self.order[i, :cut]].tolist(),
+                self.sorted_minutes[i, :cut].astype(int).tolist(),
+            )
+        )
+
+    @classmethod
+    def from_travel_matrix(cls, travel_matrix):
+        """Isochrones for the workplace districts whose travel matrix row is complete"""
+        complete = ~np.any(travel_matrix.minutes == NOT_COMPUTED, axis=1)
+        minutes = np.asarray(travel_matrix.minutes[complete], dtype=np.float32)
+        minutes[minutes >= NO_JOURNEY] = np.inf
+        return cls(travel_matrix.keys, minutes, origins=travel_matrix.keys[complete])
+
+
+def get_isochrone_cache_file(name, districts, cache_dir=None):
+    if cache_dir is None:
+        cache_dir = pathlib.Path(__file__).parent.resolve() / "map_cache"
+    return (
+        pathlib.Path(cache_dir)
+        / f"isochrones-{name}-{get_districts_fingerprint(districts)[:12]}.npz"
+    )
+
+
+def load_or_build_isochrones(name, districts, compute_minutes, cache_dir=None):
+    """
+    Load the isochrones for this mode and district set from cache_dir (map_cache
+    by default), or build them from compute_minutes(keys) -> N x N minutes and
+    save them. Isochrones of a road graph belong in its cache directory, which is
+    cleared whenever the graph is rebuilt.
+    """
+    cache_file = get_isochrone_cache_file(name, districts, cache_dir)
+    keys = list(districts.keys())
+    if os.path.exists(cache_file):
+        with np.load(cache_file, allow_pickle=False) as cache:
+            if cache["keys"].tolist() == keys:
+                logging.info(f"Loaded {name} isochrones from cache")
+                return IsochroneIndex(keys, cache["minutes"])
+
+    logging.info(f"Building {name} isochrones for {len(keys)} districts")
+    minutes = np.asarray(compute_minutes(keys), dtype=np.float32)
+    os.makedirs(cache_file.parent, exist_ok=True)
+    tmp_file = cache_file.with_name(f"{cache_file.stem}.{os.getpid()}.tmp.npz")
+    np.savez(tmp_file, keys=np.array(keys, dtype=str), minutes=minutes)
+    os.replace(tmp_file, cache_file)
+    return IsochroneIndex(keys, minutes)
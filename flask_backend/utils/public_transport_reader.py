@@ -1,14 +1,246 @@
 # santos will put code here
 import pickle
 import numpy as np
-import requests
 import logging
-import time
 import os
 import pathlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from sklearn.neighbors import KDTree
+from .district_index import get_district_spatial_index
+from .tfl_client import JOURNEY_PARAMS, get_tfl_client
+
+# Upper bound on straight-line public transport speed, so no district further than
+# max_travel_time at this speed can qualify
+PUBLIC_TRANSPORT_MAX_SPEED_KMH = 60.0
+# Maximum number of candidate districts to send to TfL per request
+MAX_JOURNEY_CANDIDATES = 25
+
+# Geohash precision of journey cache origin cells (7 is roughly 150m x 150m)
+JOURNEY_CACHE_PRECISION = 7
+JOURNEY_CACHE_SIZE = 10000
+JOURNEY_CACHE_TTL = 24 * 60 * 60
+# Journeys kept in the sqlite tier, and puts between purges of expired ones
+JOURNEY_CACHE_DISK_SIZE = 200000
+JOURNEY_CACHE_PURGE_INTERVAL = 1000
+JOURNEY_CACHE_PATH = os.environ.get(
+    "JOURNEY_CACHE_PATH",
+    str(pathlib.Path(__file__).parent.resolve() / "map_cache" / "journey_cache.sqlite"),
+)
+
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash(latitude, longitude, precision=JOURNEY_CACHE_PRECISION):
+    """Encode a point as a geohash cell of the given precision"""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    cell, bits, bit_count, even = [], 0, 0, True
+    while len(cell) < precision:
+        value, value_range = (longitude, lon_range) if even else (latitude, lat_range)
+        mid = (value_range[0] + value_range[1]) / 2
+        bits <<= 1
+        if value >= mid:
+            bits |= 1
+            value_range[0] = mid
+        else:
+            value_range[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            cell.append(GEOHASH_ALPHABET[bits])
+            bits, bit_count = 0, 0
+    return "".join(cell)
+
+
+def geohash_center(cell):
+    """Return the (latitude, longitude) at the centre of a geohash cell"""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in cell:
+        bits = GEOHASH_ALPHABET.index(char)
+        for shift in range(4, -1, -1):
+            value_range = lon_range if even else lat_range
+            mid = (value_range[0] + value_range[1]) / 2
+            if (bits >> shift) & 1:
+                value_range[0] = mid
+            else:
+                value_range[1] = mid
+            even = not even
+    return (lat_range[0] + lat_range[1]) / 2, (lon_range[0] + lon_range[1]) / 2
+
+
+def get_time_band():
+    """Arrival time band the TfL journeys are planned for, e.g. Arriving-09"""
+    return f"{JOURNEY_PARAMS['timeIs']}-{JOURNEY_PARAMS['time'][:2]}"
+
+
+class JourneyCache:
+    """
+    Journey minutes keyed on (origin geohash cell, destination outcode, time band),
+    so nearby workplaces reuse each other's TfL results.
+    An in-memory LRU with a TTL sits in front of an optional sqlite tier that
+    survives restarts. The sqlite tier has its own lock, so memory hits never wait
+    on disk writes, and is purged of expired journeys and capped at disk_max_size.
+    """
+
+    def __init__(
+        self,
+        precision=JOURNEY_CACHE_PRECISION,
+        max_size=JOURNEY_CACHE_SIZE,
+        ttl=JOURNEY_CACHE_TTL,
+        disk_path=None,
+        disk_max_size=JOURNEY_CACHE_DISK_SIZE,
+    ):
+        self.precision = precision
+        self.max_size = max_size
+        self.ttl = ttl
+        self.disk_max_size = disk_max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_purged = 0
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._puts_since_purge = 0
+        self.db = None
+        if disk_path is not None:
+            os.makedirs(pathlib.Path(disk_path).parent, exist_ok=True)
+            self.db = sqlite3.connect(disk_path, check_same_thread=False)
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS journeys (key TEXT PRIMARY KEY, minutes INTEGER, created REAL)"
+            )
+            self.db.execute(
+                "CREATE INDEX IF NOT EXISTS journeys_created ON journeys (created)"
+            )
+            with self._db_lock:
+                self._purge_disk()
+
+    def make_key(self, from_lat, from_lon, destination):
+        cell = geohash(float(from_lat), float(from_lon), self.precision)
+        return f"{cell}|{destination}|{get_time_band()}"
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                minutes, created = entry
+                if now - created <= self.ttl:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return minutes
+                del self.entries[key]
+
+        row = None
+        if self.db is not None:
+            with self._db_lock:
+                row = self.db.execute(
+                    "SELECT minutes, created FROM journeys WHERE key = ? AND created >= ?",
+                    (key, now - self.ttl),
+                ).fetchone()
+        with self._lock:
+            if row is not None:
+                self._put_memory(key, row[0], row[1])
+                self.disk_hits += 1
+                return row[0]
+            self.misses += 1
+            return None
+
+    def put(self, key, minutes):
+        self.put_many([(key, minutes)])
+
+    def put_many(self, journeys):
+        """Store (key, minutes) journeys, writing them to disk in one transaction"""
+        now = time.time()
+        rows = [(key, minutes, now) for key, minutes in journeys]
+        if not rows:
+            return
+        with self._lock:
+            for key, minutes, _ in rows:
+                self._put_memory(key, minutes, now)
+        if self.db is not None:
+            with self._db_lock:
+                with self.db:
+                    self.db.executemany(
+                        "INSERT OR REPLACE INTO journeys VALUES (?, ?, ?)", rows
+                    )
+                self._puts_since_purge += len(rows)
+                if self._puts_since_purge >= JOURNEY_CACHE_PURGE_INTERVAL:
+                    self._purge_disk()
+
+    def _purge_disk(self):
+        """Delete expired journeys, then the oldest beyond disk_max_size"""
+        with self.db:
+            purged = self.db.execute(
+                "DELETE FROM journeys WHERE created < ?", (time.time() - self.ttl,)
+            ).rowcount
+            purged += self.db.execute(
+                "DELETE FROM journeys WHERE key IN (SELECT key FROM journeys ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                (self.disk_max_size,),
+            ).rowcount
+        self.disk_purged += purged
+        self._puts_since_purge = 0
+
+    def _put_memory(self, key, minutes, created):
+        self.entries[key] = (minutes, created)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def observations(self):
+        """
+        Yield (origin latitude, origin longitude, destination, minutes) for every
+        unexpired journey held in the cache, origins being the centre of their cell
+        """
+        oldest = time.time() - self.ttl
+        if self.db is not None:
+            with self._db_lock:
+                rows = self.db.execute(
+                    "SELECT key, minutes FROM journeys WHERE created >= ?", (oldest,)
+                ).fetchall()
+        else:
+            with self._lock:
+                rows = [
+                    (key, minutes)
+                    for key, (minutes, created) in self.entries.items()
+                    if created >= oldest
+                ]
+        for key, minutes in rows:
+            cell, destination, _ = key.split("|")
+            yield (*geohash_center(cell), destination, minutes)
+
+    def stats(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "precision": self.precision,
+            "size": len(self.entries),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "disk_purged": self.disk_purged,
+            "hit_ratio": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
+
+
+_journey_cache = None
+_journey_cache_lock = threading.Lock()
+
+
+def get_journey_cache():
+    """Return the shared JourneyCache, opening its on-disk tier on first use"""
+    global _journey_cache
+    if _journey_cache is None:
+        with _journey_cache_lock:
+            if _journey_cache is None:
+                _journey_cache = JourneyCache(disk_path=JOURNEY_CACHE_PATH or None)
+    return _journey_cache
 
 
 def filter_districts_by_distance(
@@ -18,56 +250,50 @@ def filter_districts_by_distance(
     districts,
     max_travel_time,
     travel_cache=None,
+    max_speed=PUBLIC_TRANSPORT_MAX_SPEED_KMH,
+    max_candidates=MAX_JOURNEY_CANDIDATES,
+    travel_matrix=None,
+    journey_cache=None,
+    isochrones=None,
+    surrogate=None,
 ):
     """
     Filter districts by travel time from the workplace district.
-    If travel_cache is None, calculate distances on-the-fly using multithreading.
+    If the precomputed isochrones or the travel_matrix cover the workplace district,
+    answer from them without any network calls.
+    Otherwise candidates are the districts within max_travel_time at max_speed of the
+    workplace, nearest first and capped at max_candidates.
+    If travel_cache is None, calculate distances on-the-fly using multithreading,
+    reusing journeys from journey_cache (the shared JourneyCache by default).
+    With a travel time surrogate, districts whose estimate is clearly inside or
+    outside max_travel_time are decided without TfL; only borderline ones are fetched.
     """
-
-    # Create cache directory if it doesn't exist
-    cache_path = pathlib.Path(__file__).parent.resolve() / "map_cache"
-    os.makedirs(cache_path, exist_ok=True)
-
-    # Build path for KD tree cache file
-    kd_tree_cache_file = f"{cache_path}/districts_kd_tree.pkl"
-
-    # Create nodes array for KD tree
-    nodes = np.array(
-        [
-            [float(data["latitude"]), float(data["longitude"])]
-            for _, data in districts.items()
-        ]
-    )
-    district_keys = list(districts.keys())
-
-    # Load or create KD tree
-    kd_tree = None
-    if os.path.exists(kd_tree_cache_file):
-        print("Loading KD tree from cache...")
-        with open(kd_tree_cache_file, "rb") as f:
-            kd_tree = pickle.load(f)
-        print("Loaded KD tree from cache")
-    else:
-        print("Creating new KD tree...")
-        kd_tree = KDTree(nodes)
-        # Save to cache
-        with open(kd_tree_cache_file, "wb") as f:
-            pickle.dump(kd_tree, f)
-        print("Saved KD tree to cache")
-
-    # Query the KD tree - ensure we're passing a 2D array
-    query_point = np.array([[workplace_latitude, workplace_longitude]])
-    k = 10
-    _, indices = kd_tree.query(query_point, k=k)
-
-    # Get the nearest districts
-    nearest_district_indices = indices[0]  # Get the first row of indices
-    nearest_districts = [district_keys[i] for i in nearest_district_indices]
+    if isochrones is not None and workplace_district in isochrones:
+        return isochrones.reachable(workplace_district, max_travel_time)
+    if (
+        travel_matrix is not None
+        and workplace_district in travel_matrix
+        and travel_matrix.is_complete(workplace_district)
+    ):
+        return travel_matrix.reachable(workplace_district, max_travel_time)
+
+    # Shared centroid arrays and KD tree, built once per district set
+    district_index = get_district_spatial_index(districts)
+
+    # Get the districts that could be reached in time, nearest first
+    radius_km = max_speed * float(max_travel_time) / 60
+    nearest_districts = [
+        district
+        for district, _ in district_index.within_radius(
+            workplace_latitude, workplace_longitude, radius_km, max_candidates
+        )
+    ]
+    # The workplace district is always a candidate, even if its centroid is far away
+    if workplace_district in districts and workplace_district not in nearest_districts:
+        nearest_districts.insert(0, workplace_district)
 
     # Filter the districts dictionary to only include the nearest districts
-    filtered_districts_dict = {
-        k: v for k, v in districts.items() if k in nearest_districts
-    }
+    filtered_districts_dict = {k: districts[k] for k in nearest_districts}
 
     result_districts = {}
 
@@ -77,10 +303,6 @@ def filter_districts_by_distance(
             f"No travel cache provided, calculating distances on-the-fly for workplace district: {workplace_district}"
         )
 
-        # Rate limiting variables
-        request_timestamps = []
-        requests_per_minute_limit = 499  # To be safe, staying below 500
-
         # Create a list of districts to calculate (excluding workplace district)
         district_calculations = []
         for district, data in filtered_districts_dict.items():
@@ -107,33 +329,65 @@ def filter_districts_by_distance(
                     )
                 )
 
-        # Define a wrapper function for get_journey that handles rate limiting and returns district info
-        def get_journey_with_rate_limit(calculation):
-            from_lat, from_lon, to_lat, to_lon, district = calculation
-
-            # Check rate limiting - this is now per-thread
-            current_time = time.time()
-            # We need thread-safe rate limiting, so we'll use a simpler approach
-            # Sleep a small amount to avoid overwhelming the API
-            time.sleep(0.1)  # Simple rate limiting - 10 requests per second max
-
-            try:
-                journey_duration = get_journey(from_lat, from_lon, to_lat, to_lon)
-                return (district, journey_duration)
-            except Exception as e:
-                logging.error(f"Error calculating journey to {district}: {str(e)}")
-                return (district, None)
-
         start_time = time.time()
 
-        # Use map instead of submit/as_completed
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            # Process all districts in parallel using map
-            for district, journey_duration in executor.map(
-                get_journey_with_rate_limit, district_calculations
+        # Reuse journeys already fetched from nearby origins
+        if journey_cache is None:
+            journey_cache = get_journey_cache()
+        journey_durations = {}
+        uncached_calculations = []
+        for calculation in district_calculations:
+            from_lat, from_lon, _, _, district = calculation
+            cache_key = journey_cache.make_key(from_lat, from_lon, district)
+            journey_duration = journey_cache.get(cache_key)
+            if journey_duration is None:
+                uncached_calculations.append((calculation, cache_key))
+            else:
+                journey_durations[district] = journey_duration
+
+        # Decide the clear-cut districts from the surrogate estimate
+        if surrogate is not None and uncached_calculations:
+            estimates = surrogate.estimate(
+                [calculation[0] for calculation, _ in uncached_calculations],
+                [calculation[1] for calculation, _ in uncached_calculations],
+                [workplace_district] * len(uncached_calculations),
+                [calculation[4] for calculation, _ in uncached_calculations],
+            )
+            borderline_calculations = []
+            for (calculation, cache_key), estimate in zip(
+                uncached_calculations, estimates
             ):
-                if journey_duration is not None and journey_duration <= max_travel_time:
-                    result_districts[district] = journey_duration
+                if estimate + surrogate.error_bound <= max_travel_time:
+                    journey_durations[calculation[4]] = max(0, round(estimate))
+                elif estimate - surrogate.error_bound <= max_travel_time:
+                    borderline_calculations.append((calculation, cache_key))
+            logging.info(
+                f"Surrogate decided {len(uncached_calculations) - len(borderline_calculations)} of {len(uncached_calculations)} districts"
+            )
+            uncached_calculations = borderline_calculations
+
+        # Fetch the rest concurrently over the shared TfL connection pool
+        fetched_durations = get_tfl_client().get_journeys_sync(
+            [calculation[:4] for calculation, _ in uncached_calculations]
+        )
+        fetched_journeys = []
+        for (calculation, cache_key), journey_duration in zip(
+            uncached_calculations, fetched_durations
+        ):
+            district = calculation[4]
+            if isinstance(journey_duration, Exception):
+                logging.error(
+                    f"Error calculating journey to {district}: {str(journey_duration)}"
+                )
+                continue
+            fetched_journeys.append((cache_key, journey_duration))
+            journey_durations[district] = journey_duration
+        # one disk transaction per request rather than one per journey
+        journey_cache.put_many(fetched_journeys)
+
+        for district, journey_duration in journey_durations.items():
+            if journey_duration <= max_travel_time:
+                result_districts[district] = journey_duration
 
         print(f"Total time: {time.time() - start_time:.2f} seconds")
         return result_districts
@@ -191,19 +445,18 @@ def get_all_distances(districts):
         f"Will calculate {len(district_pairs)} one-way journeys between districts"
     )
 
-    # Define a wrapper function for get_journey that handles rate limiting and returns district pair info
+    # Define a wrapper function for get_journey that returns district pair info
     def get_journey_with_rate_limit(pair):
         district1, district2 = pair
 
-        # Simple rate limiting - sleep a small amount to avoid overwhelming the API
-        time.sleep(0.1)  # 10 requests per second max
-
         try:
+            # offline, so wait as long as the shared TfL rate limiter needs
             journey_duration = get_journey(
                 districts[district1]["latitude"],
                 districts[district1]["longitude"],
                 districts[district2]["latitude"],
                 districts[district2]["longitude"],
+                max_wait=float("inf"),
             )
             return (district1, district2, journey_duration)
         except Exception as e:
@@ -235,32 +488,18 @@ def get_all_distances(districts):
     return distances
 
 
-def get_journey(from_lat, from_lon, to_lat, to_lon):
+def get_journey(from_lat, from_lon, to_lat, to_lon, max_wait=None):
     """
     Get the average journey time in minutes for public transport duration from one location to another, without the walking time
+    Waits for the shared TfL rate limiter first, raising RateLimitExceeded after max_wait seconds,
+    and retries transient failures through the shared TfL client
     """
-
-    output = "applications/json"
-    r = requests.get(
-        f"https://api.tfl.gov.uk/Journey/JourneyResults/{from_lat},{from_lon}/to/{to_lat},{to_lon}?nationalSearch=false&date=20250224&time=0900&timeIs=Arriving&journeyPreference=LeastWalking&alternativeCycle=false&walkingOptimization=true&routeBetweenEntrances=false&app_id=Burghandi&app_key=95598b12d85e401fbe896c199885b792",
-        headers={"Accept": output},
-    )
-    if r.status_code != 200:
-        raise Exception(
-            f"Failed to get journey: from {from_lat},{from_lon} to {to_lat},{to_lon} with status code {r.status_code}"
-        )
-
-    journeys = r.json()["journeys"]
-    if len(journeys) < 1:
-        raise Exception(
-            f"No journey found: from {from_lat},{from_lon} to {to_lat},{to_lon}"
-        )
-
-    if journeys[0] == "walking":
-        journeys = journeys[1:]
-    journey_duration = [journey["duration"] for journey in journeys]
-
-    return round(sum(journey_duration) / len(journey_duration))
+    journey_duration = get_tfl_client().get_journeys_sync(
+        [(from_lat, from_lon, to_lat, to_lon)], max_wait=max_wait
+    )[0]
+    if isinstance(journey_duration, Exception):
+        raise journey_duration
+    return journey_duration
 
 
 if __name__ == "__main__":
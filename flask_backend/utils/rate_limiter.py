@@ -0,0 +1,84 @@
+import threading
+import time
+
+
+class RateLimitExceeded(Exception):
+    pass
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket shared by every caller of one upstream API.
+    Tokens refill at `rate` per second up to `capacity`, so short bursts go out
+    immediately and sustained traffic is held to `rate`.
+    """
+
+    def __init__(self, name, rate, capacity, max_wait=30.0):
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+        self.max_wait = max_wait
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.acquired = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def get_wait_time(self):
+        """Seconds a new request would currently have to wait for a token"""
+        with self._lock:
+            self._refill(time.monotonic())
+            return max(0.0, (1 - self.tokens) / self.rate)
+
+    def acquire(self, max_wait=None):
+        """
+        Take a token, sleeping until one is available.
+        Raises RateLimitExceeded instead if that would take longer than max_wait.
+        """
+        if max_wait is None:
+            max_wait = self.max_wait
+        with self._lock:
+            self._refill(time.monotonic())
+            wait = max(0.0, (1 - self.tokens) / self.rate)
+            if wait > max_wait:
+                self.rejected += 1
+                raise RateLimitExceeded(
+                    f"{self.name} rate limit exceeded, would wait {wait:.2f}s"
+                )
+            # reserve the token now so concurrent callers queue up behind us
+            self.tokens -= 1
+            self.acquired += 1
+            self.total_wait += wait
+        if wait > 0:
+            time.sleep(wait)
+
+    def stats(self):
+        return {
+            "rate": self.rate,
+            "capacity": self.capacity,
+            "wait_time": self.get_wait_time(),
+            "acquired": self.acquired,
+            "rejected": self.rejected,
+            "total_wait": self.total_wait,
+        }
+
+
+# One bucket per upstream, shared by every thread in the process
+RATE_LIMITERS = {
+    # TfL allows 500 requests per minute per app key
+    "tfl": TokenBucket("tfl", rate=499 / 60, capacity=10),
+    "postcodes": TokenBucket("postcodes", rate=10, capacity=20),
+}
+
+
+def get_rate_limiter(name):
+    return RATE_LIMITERS[name]
+
+
+def get_rate_limiter_stats():
+    return {name: limiter.stats() for name, limiter in RATE_LIMITERS.items()}
@@ -1,6 +1,27 @@
+import numpy as np
 import pandas as pd
 import requests
 import logging
+import os
+import pathlib
+import pickle
+import threading
+import time
+
+from .borough_lookup import boroughs_for_points
+from .district_index import DISTRICTS_PATH
+from .file_hash import get_file_hash
+from .rate_limiter import get_rate_limiter
+from .reverse_geocoder import get_reverse_geocoder
+from .single_flight import single_flight
+
+RENT_DATA_PATH = "data/rent_data.xlsx"
+RENT_COLUMNS = ["Mean", "LowerQ", "Median", "UpperQ"]
+RENT_CACHE_VERSION = 1
+# seconds between checks of the rent workbook for changes
+RENT_RELOAD_INTERVAL = 30
+# set REMOTE_GEOCODE_FALLBACK=0 to never call postcodes.io for reverse geocoding
+REMOTE_GEOCODE_FALLBACK = os.environ.get("REMOTE_GEOCODE_FALLBACK", "1") != "0"
 
 
 def is_numeric(value):
@@ -21,7 +42,7 @@ def get_district_names():
     return district_data["District"].unique()
 
 
-def get_rent_data(file_path="data/rent_data.xlsx"):
+def get_rent_data(file_path=RENT_DATA_PATH):
     raw_data = pd.ExcelFile(file_path)
     district_data = raw_data.parse(
         "3",
@@ -84,8 +105,59 @@ def get_rent_data(file_path="data/rent_data.xlsx"):
     return district_data, burrough_data
 
 
-def get_burrough_by_district(district):
+_burrough_index = None
+_burrough_index_lock = threading.Lock()
+
+
+def build_burrough_index(districts):
+    """
+    Build the outcode -> burroughs index from the postcodes.io outcode records
+    already held in districts.pkl, replacing any previously built index.
+    The borough containing each district centroid is listed first, so it is the
+    one used for rent fallbacks and the crime/planning models.
+    """
+    global _burrough_index
+    outcodes = list(districts.keys())
+    try:
+        centroid_boroughs = boroughs_for_points(
+            [float(districts[outcode]["latitude"]) for outcode in outcodes],
+            [float(districts[outcode]["longitude"]) for outcode in outcodes],
+        )
+    except Exception as e:
+        logging.error(f"Error resolving district boroughs from boundaries: {e}")
+        centroid_boroughs = [None] * len(outcodes)
+
+    index = {}
+    for outcode, centroid_borough in zip(outcodes, centroid_boroughs):
+        burroughs = list(districts[outcode].get("admin_district") or [])
+        if centroid_borough is not None:
+            burroughs = [centroid_borough] + [
+                burrough for burrough in burroughs if burrough != centroid_borough
+            ]
+        if burroughs:
+            index[outcode] = burroughs
+    _burrough_index = index
+    logging.info(f"Built burrough index for {len(index)} districts")
+    return index
+
+
+def get_burrough_index():
+    """Return the outcode -> burroughs index, building it from districts.pkl on first use"""
+    if _burrough_index is None:
+        with _burrough_index_lock:
+            if _burrough_index is None:
+                districts = {}
+                if os.path.exists(DISTRICTS_PATH):
+                    with open(DISTRICTS_PATH, "rb") as f:
+                        districts = pickle.load(f)
+                build_burrough_index(districts)
+    return _burrough_index
+
+
+@single_flight("postcodes_outcode_burrough")
+def fetch_burrough_by_district(district):
     url = f"https://api.postcodes.io/outcodes/{district}"
+    get_rate_limiter("postcodes").acquire()
     response = requests.get(url)
     response.raise_for_status()  # Raise exception for bad status codes
     try:
@@ -94,24 +166,242 @@ def get_burrough_by_district(district):
         return response.json()["result"][0]["admin_district"]
 
 
-def get_rent_by_burrough(rent_data, burroughs):
-    # try first burrough thats in our data
-    for burrough in burroughs:
-        if burrough in rent_data["Burrough"].values:
-            return rent_data[rent_data["Burrough"] == burrough]["Mean"].values[0]
+def get_burrough_by_district(district):
+    """
+    Return the burroughs an outcode falls in, from the offline index when possible
+    and from postcodes.io only for outcodes the index does not know about.
+    """
+    burrough_index = get_burrough_index()
+    burroughs = burrough_index.get(district)
+    if burroughs is None:
+        logging.info(f"District {district} not in burrough index, fetching from API")
+        burroughs = fetch_burrough_by_district(district)
+        burrough_index[district] = burroughs
+    return burroughs
+
+
+def get_rent_cache_file(file_path=RENT_DATA_PATH):
+    cache_path = pathlib.Path(__file__).parent.resolve() / "rent_cache"
+    return cache_path / f"{pathlib.Path(file_path).stem}.npz"
+
+
+def build_rent_cache(file_path=RENT_DATA_PATH, cache_file=None):
+    """
+    Parse the rent workbook and write the cleaned district and burrough tables
+    to a columnar .npz file, tagged with the workbook's mtime and hash.
+    """
+    if cache_file is None:
+        cache_file = get_rent_cache_file(file_path)
+    os.makedirs(pathlib.Path(cache_file).parent, exist_ok=True)
+
+    district_data, burrough_data = get_rent_data(file_path)
+    tables = {
+        "district_names": district_data["District"].to_numpy(dtype=str),
+        "district_values": district_data[RENT_COLUMNS].to_numpy(dtype=np.float64),
+        "burrough_names": burrough_data["Burrough"].to_numpy(dtype=str),
+        "burrough_values": burrough_data[RENT_COLUMNS].to_numpy(dtype=np.float64),
+    }
+    # write to a temporary file first so a crash never leaves a truncated cache,
+    # named per process so workers starting together never share one
+    tmp_file = f"{cache_file}.{os.getpid()}.tmp.npz"
+    np.savez(
+        tmp_file,
+        version=RENT_CACHE_VERSION,
+        source_mtime=os.stat(file_path).st_mtime_ns,
+        source_hash=get_file_hash(file_path),
+        **tables,
+    )
+    os.replace(tmp_file, cache_file)
+    logging.info(f"Saved rent cache to {cache_file}")
+    return tables
+
+
+def load_rent_tables(file_path=RENT_DATA_PATH, cache_file=None):
+    """
+    Load the cleaned rent tables from the .npz cache, rebuilding it only when the
+    workbook's mtime and content hash no longer match the cached ones.
+    """
+    if cache_file is None:
+        cache_file = get_rent_cache_file(file_path)
+    if os.path.exists(cache_file):
+        try:
+            with np.load(cache_file, allow_pickle=False) as cache:
+                if int(cache["version"]) == RENT_CACHE_VERSION and (
+                    int(cache["source_mtime"]) == os.stat(file_path).st_mtime_ns
+                    or str(cache["source_hash"]) == get_file_hash(file_path)
+                ):
+                    return {
+                        name: cache[name]
+                        for name in (
+                            "district_names",
+                            "district_values",
+                            "burrough_names",
+                            "burrough_values",
+                        )
+                    }
+            logging.info("Rent workbook changed, rebuilding rent cache")
+        except Exception as e:
+            logging.error(f"Error loading rent cache: {e}")
+    return build_rent_cache(file_path, cache_file)
+
+
+class RentIndex:
+    """
+    In-memory district and burrough rent statistics, loaded once from the rent cache.
+    Lookups are a dictionary access plus an array index; call reload_if_changed to
+    pick up a new workbook, or reload_if_stale to check at most every
+    reload_interval seconds.
+    """
+
+    def __init__(self, file_path=RENT_DATA_PATH, reload_interval=RENT_RELOAD_INTERVAL):
+        self.file_path = file_path
+        self.reload_interval = reload_interval
+        self.checked = time.monotonic()
+        self.mtime = None
+        self.district_rows = {}
+        self.district_values = None
+        self.burrough_rows = {}
+        self.burrough_values = None
+        self.column_means = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        mtime = os.path.getmtime(self.file_path)
+        tables = load_rent_tables(self.file_path)
+        district_values = tables["district_values"]
+        burrough_values = tables["burrough_values"]
+        column_means = {
+            column: (
+                np.nanmean(district_values[:, i]),
+                np.nanmean(burrough_values[:, i]),
+            )
+            for i, column in enumerate(RENT_COLUMNS)
+        }
+        # swap in whole tables so concurrent readers never see a half-built index
+        (
+            self.district_rows,
+            self.district_values,
+            self.burrough_rows,
+            self.burrough_values,
+            self.column_means,
+        ) = (
+            self._to_rows(tables["district_names"]),
+            district_values,
+            self._to_rows(tables["burrough_names"]),
+            burrough_values,
+            column_means,
+        )
+        self.mtime = mtime
+        logging.info(
+            f"Loaded rent index with {len(self.district_rows)} districts and {len(self.burrough_rows)} burroughs"
+        )
+
+    def reload_if_changed(self):
+        """Reload the index if the workbook was modified since it was last read"""
+        if os.path.getmtime(self.file_path) == self.mtime:
+            return False
+        with self._lock:
+            if os.path.getmtime(self.file_path) == self.mtime:
+                return False
+            self.load()
+        return True
+
+    def reload_if_stale(self):
+        """reload_if_changed, statting the workbook at most once per reload_interval"""
+        now = time.monotonic()
+        if now - self.checked < self.reload_interval:
+            return False
+        self.checked = now
+        return self.reload_if_changed()
+
+    @staticmethod
+    def _to_rows(names):
+        rows = {}
+        for i, name in enumerate(names.tolist()):
+            rows.setdefault(name, i)
+        return rows
+
+    def get_district_rent(self, district, column="Mean"):
+        """Return the rent statistic for a district, or None if the district has no data"""
+        row = self.district_rows.get(district)
+        if row is None:
+            return None
+        rent = self.district_values[row, RENT_COLUMNS.index(column)]
+        if np.isnan(rent):
+            return None
+        return float(rent)
+
+    def get_burrough_rent(self, burroughs, column="Mean"):
+        """Return the rent statistic for the first of the given burroughs in the data"""
+        for burrough in burroughs:
+            row = self.burrough_rows.get(burrough)
+            if row is not None:
+                return float(self.burrough_values[row, RENT_COLUMNS.index(column)])
+        return None
+
+    def get_column_mean(self, column):
+        """Return the (district, burrough) averages of a rent statistic"""
+        return self.column_means[column]
+
+
+_rent_index = None
+_rent_index_lock = threading.Lock()
+
+
+def get_rent_index():
+    """
+    Return the shared RentIndex, building it on first use and picking up a changed
+    workbook within RENT_RELOAD_INTERVAL seconds
+    """
+    global _rent_index
+    if _rent_index is None:
+        with _rent_index_lock:
+            if _rent_index is None:
+                _rent_index = RentIndex()
+    else:
+        _rent_index.reload_if_stale()
+    return _rent_index
 
 
 def get_rent_by_district(district):
-    district_data, burrough_data = get_rent_data()
-    # if any of the 'Mean' values in the district data are not None or NaN, return the mean value from the district data
-    if any(district_data[district_data["District"] == district]["Mean"].notna()):
-        return district_data[district_data["District"] == district]["Mean"].values[0]
+    rent_index = get_rent_index()
+    rent = rent_index.get_district_rent(district)
+    if rent is not None:
+        return rent
+    return rent_index.get_burrough_rent(get_burrough_by_district(district))
+
+
+def get_district_from_coords(lat, lon, fallback=None):
+    """
+    Resolve a point to its outcode with the local reverse geocoder, falling back to
+    postcodes.io for points outside its coverage when fallback is enabled
+    """
+    if lat is None or lon is None:
+        return None
+    return get_districts_from_coords([lat], [lon], fallback=fallback)[0]
+
+
+def get_districts_from_coords(lats, lons, fallback=None):
+    """Batch version of get_district_from_coords, resolving all points in one query"""
+    if fallback is None:
+        fallback = REMOTE_GEOCODE_FALLBACK
+    reverse_geocoder = get_reverse_geocoder()
+    if reverse_geocoder is None:
+        outcodes = [None] * len(lats)
     else:
-        return get_rent_by_burrough(burrough_data, get_burrough_by_district(district))
+        outcodes = reverse_geocoder.lookup(lats, lons).tolist()
+    if fallback:
+        for i, outcode in enumerate(outcodes):
+            if outcode is None:
+                outcodes[i] = fetch_district_from_coords(lats[i], lons[i])
+    return outcodes
 
 
-def get_district_from_coords(lat, lon):
+@single_flight("postcodes_reverse_geocode")
+def fetch_district_from_coords(lat, lon):
     url = f"https://api.postcodes.io/postcodes?lon={lon}&lat={lat}"
+    get_rate_limiter("postcodes").acquire()
     response = requests.get(url)
     response.raise_for_status()  # Raise exception for bad status codes
     try:
@@ -128,13 +418,13 @@ def get_rent_range(rent):
     :rent: int - 1 - Lower, 2 - Median, 3 - Upper
     """
     # get rent Upper, Lower and Median
-    district_data, burrough_data = get_rent_data()
+    rent_index = get_rent_index()
     min_rent = 0
     max_rent = 10000
     if rent == 1:
-        max_rent = (district_data["LowerQ"].mean() + burrough_data["LowerQ"].mean()) / 2
+        max_rent = sum(rent_index.get_column_mean("LowerQ")) / 2
     elif rent == 2:
-        max_rent = (district_data["Median"].mean() + burrough_data["Median"].mean()) / 2
+        max_rent = sum(rent_index.get_column_mean("Median")) / 2
     elif rent == 3:
         max_rent = 10000
 
@@ -0,0 +1,61 @@
+import numpy as np
+import logging
+import os
+import pickle
+import threading
+
+from .district_index import DISTRICTS_PATH, EARTH_RADIUS_KM, get_district_spatial_index
+
+
+class ReverseGeocoder:
+    """
+    Resolve (lat, lon) points to outcodes locally by nearest district centroid,
+    querying the haversine BallTree of the shared DistrictSpatialIndex.
+    """
+
+    def __init__(self, districts, max_distance_km=5.0):
+        self.max_distance_km = max_distance_km
+        district_index = get_district_spatial_index(districts)
+        self.outcodes = district_index.keys
+        self.tree = district_index.tree
+
+    def lookup(self, lats, lons):
+        """
+        Resolve a batch of points in one query.
+        Returns an array of outcodes, with None for points further than
+        max_distance_km from every district centroid.
+        """
+        points = np.radians(
+            np.column_stack(
+                [np.asarray(lats, dtype=float), np.asarray(lons, dtype=float)]
+            )
+        )
+        distances, indices = self.tree.query(points, k=1)
+        # fancy indexing copies, so the shared keys are never overwritten
+        outcodes = self.outcodes[indices[:, 0]]
+        outcodes[distances[:, 0] * EARTH_RADIUS_KM > self.max_distance_km] = None
+        return outcodes
+
+
+_reverse_geocoder = None
+_reverse_geocoder_lock = threading.Lock()
+
+
+def build_reverse_geocoder(districts, **kwargs):
+    """Build the shared ReverseGeocoder, replacing any previously built one"""
+    global _reverse_geocoder
+    _reverse_geocoder = ReverseGeocoder(districts, **kwargs)
+    logging.info(f"Built reverse geocoder for {len(districts)} districts")
+    return _reverse_geocoder
+
+
+def get_reverse_geocoder():
+    """Return the shared ReverseGeocoder, building it from districts.pkl on first use"""
+    if _reverse_geocoder is None:
+        with _reverse_geocoder_lock:
+            if _reverse_geocoder is None:
+                if not os.path.exists(DISTRICTS_PATH):
+                    return None
+                with open(DISTRICTS_PATH, "rb") as f:
+                    build_reverse_geocoder(pickle.load(f))
+    return _reverse_geocoder
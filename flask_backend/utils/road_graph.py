@@ -0,0 +1,663 @@
+import argparse
+import fcntl
+import numpy as np
+import heapq
+import logging
+import math
+import os
+import pathlib
+import tracemalloc
+from contextlib import contextmanager
+import osmnx as ox
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components, dijkstra
+
+from .district_index import EARTH_RADIUS_KM
+from .file_hash import get_file_hash
+from .speed_profiles import SPEED_PROFILES, get_edge_speed, get_speed_profile_hash
+
+# osmnx measures edge lengths on a sphere of radius 6371009m, so great-circle
+# distances on this slightly smaller one never overestimate a route
+EARTH_RADIUS_M = EARTH_RADIUS_KM * 1000
+# bump whenever the cache layout or the edge speed rules in speed_profiles change
+GRAPH_CACHE_VERSION = 6
+# modes whose great-circle bound is too loose for A* get ALT landmarks with their
+# cache, drive because its bound assumes motorway speed on every street
+DEFAULT_LANDMARKS = {"drive": 8}
+LANDMARK_ARRAYS = ("landmarks", "landmark_from", "landmark_to")
+GRAPH_ARRAYS = (
+    "node_ids",
+    "lats",
+    "lons",
+    "indptr",
+    "indices",
+    "weights",
+    "reverse_indptr",
+    "reverse_indices",
+    "reverse_weights",
+)
+
+
+class RoadGraph:
+    """
+    Directed road network as CSR arrays. Nodes are numbered 0..N-1, node_ids maps
+    them back to OSM ids, and the out-edges of node i are
+    indices[indptr[i]:indptr[i + 1]] with their weights, lengths in meters or
+    travel seconds from a speed profile. bound_scale turns great-circle meters
+    into a lower bound on the weights: 1 for lengths, 1 / fastest speed in m/s
+    for travel times.
+    The reverse_* arrays hold the same graph with every edge flipped, for
+    searches towards a target. Routing runs in scipy's compiled Dijkstra.
+
+    The arrays can be read-only memmaps of the graph cache, in which case every
+    process routing on the same cache shares one copy through the page cache.
+    Index arrays are int32 so scipy wraps them without making its own copy.
+    Weights are stored as float32 to halve the shared arrays, but scipy's
+    Dijkstra only runs on float64, so every distances() call makes a private
+    float64 copy of the weights it searches, 8 bytes per edge (about 24 MB for
+    3M edges), freed when the call returns. The Python searches read the
+    float32 weights in place. Indices must be sorted within each row without
+    duplicates, as from_networkx leaves them, so scipy can skip re-sorting them.
+    """
+
+    def __init__(
+        self,
+        node_ids,
+        lats,
+        lons,
+        indptr,
+        indices,
+        weights,
+        reverse_indptr=None,
+        reverse_indices=None,
+        reverse_weights=None,
+        bound_scale=1.0,
+    ):
+        self.bound_scale = float(bound_scale)
+        self.node_ids = np.asarray(node_ids, dtype=np.int64)
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.indptr = np.asarray(indptr, dtype=np.int32)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.weights = np.asarray(weights, dtype=np.float32)
+        n = len(self.node_ids)
+        self.matrix = csr_matrix(
+            (self.weights, self.indices, self.indptr), shape=(n, n)
+        )
+        self.matrix.has_canonical_format = True
+        if reverse_indptr is None:
+            reversed_matrix = self.matrix.transpose().tocsr()
+            reversed_matrix.sort_indices()
+            reverse_indptr = reversed_matrix.indptr
+            reverse_indices = reversed_matrix.indices
+            reverse_weights = reversed_matrix.data
+        self.reverse_indptr = np.asarray(reverse_indptr, dtype=np.int32)
+        self.reverse_indices = np.asarray(reverse_indices, dtype=np.int32)
+        self.reverse_weights = np.asarray(reverse_weights, dtype=np.float32)
+        self.reversed_matrix = csr_matrix(
+            (self.reverse_weights, self.reverse_indices, self.reverse_indptr),
+            shape=(n, n),
+        )
+        self.reversed_matrix.has_canonical_format = True
+        # set by load_road_graph, other per-graph caches live next to the arrays
+        self.cache_dir = None
+        # ALT landmark distances, see build_landmarks
+        self.landmarks = None
+        self.landmark_from = None
+        self.landmark_to = None
+        self.landmark_slack = 0.0
+
+    def __len__(self):
+        return len(self.node_ids)
+
+    @property
+    def n_edges(self):
+        return len(self.indices)
+
+    @property
+    def nbytes(self):
+        return sum(
+            getattr(self, name).nbytes
+            for name in GRAPH_ARRAYS + LANDMARK_ARRAYS
+            if getattr(self, name) is not None
+        )
+
+    def largest_component(self):
+        """
+        The largest strongly connected component as a new RoadGraph. Routes into or
+        out of any other fragment are impossible, and snapping a point onto one
+        would make its routes fail.
+        """
+        _, labels = connected_components(
+            self.matrix, directed=True, connection="strong"
+        )
+        keep = labels == np.argmax(np.bincount(labels))
+        positions = np.cumsum(keep) - 1
+        sources = np.repeat(np.arange(len(self)), np.diff(self.indptr))
+        edges = keep[sources] & keep[self.indices]
+        indptr = np.zeros(int(keep.sum()) + 1, dtype=np.int32)
+        np.cumsum(
+            np.bincount(positions[sources[edges]], minlength=len(indptr) - 1),
+            out=indptr[1:],
+        )
+        return RoadGraph(
+            self.node_ids[keep],
+            self.lats[keep],
+            self.lons[keep],
+            indptr,
+            positions[self.indices[edges]],
+            self.weights[edges],
+            bound_scale=self.bound_scale,
+        )
+
+    @classmethod
+    def from_networkx(cls, G, mode=None):
+        """
+        Convert an osmnx MultiDiGraph, weighted by length, or by travel seconds at
+        the speed profile of mode when given. Parallel edges collapse to the
+        cheapest one, which is the only one a shortest path can use.
+        """
+        node_ids = np.fromiter(G.nodes, dtype=np.int64, count=len(G))
+        lats = np.fromiter((y for _, y in G.nodes(data="y")), np.float64, len(G))
+        lons = np.fromiter((x for _, x in G.nodes(data="x")), np.float64, len(G))
+
+        edges = G.edges(data=True)
+        u = np.fromiter((e[0] for e in edges), dtype=np.int64, count=len(edges))
+        v = np.fromiter((e[1] for e in edges), dtype=np.int64, count=len(edges))
+        w = np.fromiter((e[2]["length"] for e in edges), np.float64, len(edges))
+        bound_scale = 1.0
+        if mode is not None:
+            speeds = np.fromiter(
+                (
+                    get_edge_speed(mode, data.get("highway"), data.get("maxspeed"))
+                    for _, _, data in edges
+                ),
+                np.float64,
+                len(edges),
+            )
+            speeds /= 3.6
+            w = w / speeds
+            bound_scale = 1 / speeds.max()
+
+        sorter = np.argsort(node_ids)
+        u = sorter[np.searchsorted(node_ids, u, sorter=sorter)]
+        v = sorter[np.searchsorted(node_ids, v, sorter=sorter)]
+
+        # sort by source, target then weight and keep the first of each (u, v)
+        order = np.lexsort((w, v, u))
+        u, v, w = u[order], v[order], w[order]
+        first = np.ones(len(u), dtype=bool)
+        first[1:] = (u[1:] != u[:-1]) | (v[1:] != v[:-1])
+        u, v, w = u[first], v[first], w[first]
+
+        indptr = np.zeros(len(node_ids) + 1, dtype=np.int32)
+        np.cumsum(np.bincount(u, minlength=len(node_ids)), out=indptr[1:])
+        return cls(node_ids, lats, lons, indptr, v, w, bound_scale=bound_scale)
+
+    @classmethod
+    def compact(cls, G, mode=None):
+        """
+        Convert G keeping only its largest strongly connected component, the edge
+        weights as float32 and none of the other OSM attributes.
+        Returns the graph and a before/after report of its size.
+        """
+        graph = cls.from_networkx(G, mode).largest_component()
+        report = {
+            "nodes": (len(G), len(graph)),
+            "edges": (G.number_of_edges(), graph.n_edges),
+            "bytes": graph.nbytes,
+        }
+        logging.info(
+            f"Compacted graph from {len(G)} nodes and {G.number_of_edges()} edges "
+            f"to {len(graph)} nodes and {graph.n_edges} edges, "
+            f"{graph.nbytes / 1e6:.1f} MB of arrays"
+        )
+        return graph, report
+
+    def save(self, cache_dir, **metadata):
+        """
+        Write one .npy per array, landmarks included when they have been built, to
+        cache_dir, plus meta.npz with the metadata.
+        meta.npz is removed first and written last, so a cache interrupted
+        half-way is never mistaken for a valid one. Files are replaced rather than
+        overwritten, so processes still mapping the old arrays are unaffected.
+        Callers sharing cache_dir with other processes should hold
+        graph_cache_lock(cache_dir).
+        """
+        cache_dir = pathlib.Path(cache_dir)
+        os.makedirs(cache_dir, exist_ok=True)
+        meta_file = cache_dir / "meta.npz"
+        if meta_file.exists():
+            os.remove(meta_file)
+        # snap tables, isochrones and the like belong to the old graph, files
+        # another process is still writing are left for it to replace
+        for stale_file in [*cache_dir.glob("*.npy"), *cache_dir.glob("*.npz")]:
+            if ".tmp." not in stale_file.name:
+                os.remove(stale_file)
+        names = (
+            GRAPH_ARRAYS if self.landmarks is None else GRAPH_ARRAYS + LANDMARK_ARRAYS
+        )
+        for name in names:
+            save_array_atomic(cache_dir / f"{name}.npy", getattr(self, name))
+        tmp_file = cache_dir / f"meta.{os.getpid()}.tmp.npz"
+        np.savez(tmp_file, bound_scale=self.bound_scale, **metadata)
+        os.replace(tmp_file, meta_file)
+        self.cache_dir = cache_dir
+
+    @classmethod
+    def load(cls, cache_dir):
+        """Map the arrays saved in cache_dir read-only"""
+        cache_dir = pathlib.Path(cache_dir)
+        with np.load(cache_dir / "meta.npz", allow_pickle=False) as meta:
+            bound_scale = float(meta["bound_scale"])
+        graph = cls(
+            **{
+                name: np.load(cache_dir / f"{name}.npy", mmap_mode="r")
+                for name in GRAPH_ARRAYS
+            },
+            bound_scale=bound_scale,
+        )
+        graph.cache_dir = cache_dir
+        if all((cache_dir / f"{name}.npy").exists() for name in LANDMARK_ARRAYS):
+            graph.set_landmarks(
+                *(
+                    np.load(cache_dir / f"{name}.npy", mmap_mode="r")
+                    for name in LANDMARK_ARRAYS
+                )
+            )
+        return graph
+
+    def set_landmarks(self, landmarks, landmark_from, landmark_to):
+        """
+        Use these landmark tables for ALT. Their float32 rounding can make a
+        difference of two entries overshoot the true bound by up to eps times the
+        largest entry, so landmark_bounds subtracts that as landmark_slack.
+        """
+        self.landmarks = landmarks
+        self.landmark_from = landmark_from
+        self.landmark_to = landmark_to
+        self.landmark_slack = float(np.finfo(landmark_from.dtype).eps) * max(
+            float(np.max(table, where=np.isfinite(table), initial=0.0))
+            for table in (landmark_from, landmark_to)
+        )
+
+    def build_landmarks(self, n_landmarks=8):
+        """
+        Pick n_landmarks nodes spread around the edge of the graph by farthest-point
+        selection and store the route weights from and to each of them as float32,
+        saving them to the cache directory when there is one. By the triangle
+        inequality these give lower bounds for A* that follow the road network.
+        """
+        landmark_from = np.empty((len(self), n_landmarks), dtype=np.float32)
+        landmark_to = np.empty((len(self), n_landmarks), dtype=np.float32)
+        landmarks = []
+        # start from the node furthest from an arbitrary one
+        spread = self.distances(0)
+        for k in range(n_landmarks):
+            landmark = int(np.argmax(np.where(np.isfinite(spread), spread, -1)))
+            landmarks.append(landmark)
+            from_landmark = self.distances(landmark)
+            to_landmark = self.distances(landmark, reverse=True)
+            landmark_from[:, k] = from_landmark
+            landmark_to[:, k] = to_landmark
+            round_trip = from_landmark + to_landmark
+            spread = round_trip if k == 0 else np.minimum(spread, round_trip)
+
+        self.set_landmarks(
+            np.array(landmarks, dtype=np.int32), landmark_from, landmark_to
+        )
+        if self.cache_dir is not None:
+            with graph_cache_lock(self.cache_dir):
+                for name in LANDMARK_ARRAYS:
+                    save_array_atomic(
+                        self.cache_dir / f"{name}.npy", getattr(self, name)
+                    )
+        return self.landmarks
+
+    def landmark_bounds(self, source, target, n_active=4):
+        """
+        Function giving landmark lower bounds on the route length from nodes to
+        target, using the n_active landmarks that bound source best
+        """
+        landmark_from, landmark_to = self.landmark_from, self.landmark_to
+        slack = self.landmark_slack
+        # float64 so differences of float32 entries are exact
+        from_target = np.asarray(landmark_from[target], dtype=np.float64)
+        to_target = np.asarray(landmark_to[target], dtype=np.float64)
+        # a landmark that cannot reach or be reached from target bounds nothing,
+        # leaving it out also keeps inf - inf out of the bounds below
+        usable = np.flatnonzero(np.isfinite(from_target) & np.isfinite(to_target))
+        at_source = np.maximum(
+            from_target[usable] - landmark_from[source, usable],
+            landmark_to[source, usable] - to_target[usable],
+        )
+        active = usable[np.argsort(at_source)[-n_active:]]
+        from_target, to_target = from_target[active], to_target[active]
+
+        def bounds(nodes):
+            rows = np.asarray(nodes)[:, None]
+            # shift every bound, target's included, so ties keep their order
+            bound = (
+                np.maximum(
+                    from_target - landmark_from[rows, active],
+                    landmark_to[rows, active] - to_target,
+                ).max(axis=1, initial=0.0)
+                - slack
+            )
+            return bound.tolist()
+
+        return bounds
+
+    def distances(self, source, limit=np.inf, reverse=False):
+        """
+        Shortest route weight (travel seconds, or meters for a graph weighted by
+        length) from source to every node, or from every node to source if
+        reverse. np.inf beyond limit or where unreachable.
+        """
+        matrix = self.reversed_matrix if reverse else self.matrix
+        return dijkstra(matrix, directed=True, indices=source, limit=limit)
+
+    def distance_bound(self, node):
+        """
+        Function giving the great-circle meters from any node to node scaled by
+        bound_scale, a lower bound on the weight of every route between them
+        """
+        lats, lons = self.lats, self.lons
+        scale = 2 * EARTH_RADIUS_M * self.bound_scale
+        lat = math.radians(lats[node])
+        lon = math.radians(lons[node])
+        cos_lat = math.cos(lat)
+        radians, sin, cos, asin, sqrt = (
+            math.radians,
+            math.sin,
+            math.cos,
+            math.asin,
+            math.sqrt,
+        )
+
+        def bound(v):
+            lat_v = radians(lats[v])
+            a = (
+                sin((lat_v - lat) / 2) ** 2
+                + cos(lat_v) * cos_lat * sin((radians(lons[v]) - lon) / 2) ** 2
+            )
+            return scale * asin(min(1.0, sqrt(a)))
+
+        return bound
+
+    def shortest_path(self, source, target, method=None):
+        """(route weight, [node positions]) of the shortest route, or None"""
+        length, path, _ = self.search(source, target, method)
+        return None if path is None else (length, path)
+
+    def search(self, source, target, method=None):
+        """
+        (length, path, expanded) for one route, path None if unreachable.
+        method is "dijkstra" (scipy's one-to-all search), "astar" or
+        "bidirectional" A* with great-circle bounds, or "alt" A* with landmark
+        bounds; the default is "alt" when landmarks are built, else "astar".
+        expanded counts settled nodes.
+        """
+        if method is None:
+            method = "astar" if self.landmarks is None else "alt"
+        if method == "dijkstra":
+            return self._dijkstra(source, target)
+        if method == "astar":
+            return self._astar(source, target)
+        if method == "alt":
+            if self.landmarks is None:
+                raise ValueError("No landmarks, run build_landmarks first")
+            return self._astar(source, target, self.landmark_bounds(source, target))
+        if method == "bidirectional":
+            return self._bidirectional_astar(source, target)
+        raise ValueError(f"Unknown routing method {method}")
+
+    def _dijkstra(self, source, target):
+        dist, predecessors = dijkstra(
+            self.matrix, directed=True, indices=source, return_predecessors=True
+        )
+        expanded = int(np.isfinite(dist).sum())
+        if not np.isfinite(dist[target]):
+            return np.inf, None, expanded
+        path = [target]
+        while path[-1] != source:
+            path.append(predecessors[path[-1]])
+        return float(dist[target]), [int(node) for node in reversed(path)], expanded
+
+    def _astar(self, source, target, bounds=None):
+        """
+        bounds(nodes) gives a lower bound on the route length from each node to
+        target, great-circle distances by default
+        """
+        if bounds is None:
+            bound = self.distance_bound(target)
+            bounds = lambda nodes: [bound(v) for v in nodes]
+        indptr, indices, weights = self.indptr, self.indices, self.weights
+        dist = {source: 0.0}
+        predecessors = {source: -1}
+        settled = set()
+        heap = [(bounds([source])[0], source)]
+        while heap:
+            _, u = heapq.heappop(heap)
+            if u in settled:
+                continue
+            settled.add(u)
+            if u == target:
+                return dist[u], _walk_back(predecessors, u)[::-1], len(settled)
+            du = dist[u]
+            start, end = indptr[u], indptr[u + 1]
+            improved = []
+            for v, w in zip(indices[start:end].tolist(), weights[start:end].tolist()):
+                nd = du + w
+                if nd < dist.get(v, math.inf):
+                    dist[v] = nd
+                    predecessors[v] = u
+                    improved.append(v)
+            if improved:
+                for v, h in zip(improved, bounds(improved)):
+                    heapq.heappush(heap, (dist[v] + h, v))
+        return np.inf, None, len(settled)
+
+    def _bidirectional_astar(self, source, target):
+        """
+        Forward and backward A* with the average potential
+        p(v) = (bound(v, target) - bound(source, v)) / 2, which keeps both searches
+        consistent so they can stop as soon as their frontiers cannot improve on
+        the best meeting point found.
+        """
+        if source == target:
+            return 0.0, [source], 1
+        to_target = self.distance_bound(target)
+        from_source = self.distance_bound(source)
+
+        potentials = {}
+
+        def potential(v):
+            if v not in potentials:
+                potentials[v] = (to_target(v) - from_source(v)) / 2
+            return potentials[v]
+
+        # per direction: CSR arrays, distances, predecessors, settled, heap, sign
+        sides = [
+            (self.indptr, self.indices, self.weights, {source: 0.0}, {source: -1}),
+            (
+                self.reverse_indptr,
+                self.reverse_indices,
+                self.reverse_weights,
+                {target: 0.0},
+                {target: -1},
+            ),
+        ]
+        settled = [set(), set()]
+        heaps = [[(0.0, source)], [(0.0, target)]]
+        # keys are reduced distances, offset so each search starts at zero
+        offsets = [-potential(source), potential(target)]
+        signs = [1, -1]
+        best, meeting = math.inf, None
+        while heaps[0] and heaps[1]:
+            if heaps[0][0][0] + heaps[1][0][0] >= best + sum(offsets):
+                break
+            side = 0 if len(heaps[0]) <= len(heaps[1]) else 1
+            _, u = heapq.heappop(heaps[side])
+            if u in settled[side]:
+                continue
+            settled[side].add(u)
+            indptr, indices, weights, dist, predecessors = sides[side]
+            other_dist = sides[1 - side][3]
+            du = dist[u]
+            start, end = indptr[u], indptr[u + 1]
+            for v, w in zip(indices[start:end].tolist(), weights[start:end].tolist()):
+                nd = du + w
+                if nd < dist.get(v, math.inf):
+                    dist[v] = nd
+                    predecessors[v] = u
+                    heapq.heappush(
+                        heaps[side],
+                        (nd + signs[side] * potential(v) + offsets[side], v),
+                    )
+                if v in other_dist and dist[v] + other_dist[v] < best:
+                    best, meeting = dist[v] + other_dist[v], v
+
+        expanded = len(settled[0]) + len(settled[1])
+        if meeting is None:
+            return np.inf, None, expanded
+        path = (
+            _walk_back(sides[0][4], meeting)[::-1]
+            + _walk_back(sides[1][4], meeting)[1:]
+        )
+        return best, path, expanded
+
+
+def _walk_back(predecessors, node):
+    path = [node]
+    while predecessors[path[-1]] != -1:
+        path.append(predecessors[path[-1]])
+    return path
+
+
+def get_graph_cache_dir(graphml_file):
+    return pathlib.Path(graphml_file).with_suffix(".graph")
+
+
+def save_array_atomic(file, array):
+    """
+    Save array to file through a temporary file private to this process, so
+    concurrent writers never interleave and readers never see a partial file
+    """
+    file = pathlib.Path(file)
+    tmp_file = file.with_name(f"{file.stem}.{os.getpid()}.tmp.npy")
+    np.save(tmp_file, array)
+    os.replace(tmp_file, file)
+
+
+@contextmanager
+def graph_cache_lock(cache_dir):
+    """Hold an exclusive lock on cache_dir across processes while rebuilding it"""
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(pathlib.Path(cache_dir) / "build.lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _load_graph_cache(graphml_file, cache_dir, mode):
+    """The cached RoadGraph for graphml_file, or None if it is missing or stale"""
+    meta_file = cache_dir / "meta.npz"
+    if not os.path.exists(meta_file):
+        return None
+    try:
+        with np.load(meta_file, allow_pickle=False) as meta:
+            if (
+                int(meta["version"]) == GRAPH_CACHE_VERSION
+                and str(meta["mode"]) == str(mode)
+                and str(meta["profile_hash"]) == get_speed_profile_hash(mode)
+            ) and (
+                int(meta["source_mtime"]) == os.stat(graphml_file).st_mtime_ns
+                or str(meta["source_hash"]) == get_file_hash(graphml_file)
+            ):
+                return RoadGraph.load(cache_dir)
+        logging.info(f"{graphml_file} changed, rebuilding graph cache")
+    except Exception as e:
+        logging.error(f"Error loading graph cache: {e}")
+    return None
+
+
+def load_road_graph(graphml_file, G=None, mode=None):
+    """
+    Map the RoadGraph for a graphml file from its binary cache directory,
+    rebuilding the cache from the graphml (or from G when it is already in
+    memory) only when the graphml's mtime and content hash no longer match the
+    cached ones or mode's speed profile has changed since. Weights are travel
+    seconds at mode's speed profile, or lengths if mode is None. Modes in
+    DEFAULT_LANDMARKS get their ALT landmarks built with the cache.
+    """
+    cache_dir = get_graph_cache_dir(graphml_file)
+    if G is None:
+        graph = _load_graph_cache(graphml_file, cache_dir, mode)
+        if graph is not None:
+            return graph
+
+    with graph_cache_lock(cache_dir):
+        # another worker may have rebuilt the cache while we waited for the lock
+        graph = _load_graph_cache(graphml_file, cache_dir, mode)
+        if graph is not None:
+            return graph
+        if G is None:
+            G = ox.load_graphml(graphml_file)
+        graph, _ = RoadGraph.compact(G, mode)
+        if mode in DEFAULT_LANDMARKS:
+            graph.build_landmarks(DEFAULT_LANDMARKS[mode])
+        graph.save(
+            cache_dir,
+            version=GRAPH_CACHE_VERSION,
+            mode=str(mode),
+            profile_hash=get_speed_profile_hash(mode),
+            source_mtime=os.stat(graphml_file).st_mtime_ns,
+            source_hash=get_file_hash(graphml_file),
+        )
+        logging.info(f"Saved graph cache to {cache_dir}")
+    # route on the mapped copy so this process shares it like every other
+    return RoadGraph.load(cache_dir)
+
+
+def report_compaction(graphml_file, mode=None):
+    """Load graphml_file as networkx and as a compact RoadGraph and compare their size"""
+    tracemalloc.start()
+    G = ox.load_graphml(graphml_file)
+    networkx_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    _, report = RoadGraph.compact(G, mode)
+    print(graphml_file)
+    print(f"{'':<8}{'networkx':>14}{'compact':>14}")
+    for name in ("nodes", "edges"):
+        print(f"{name:<8}{report[name][0]:>14}{report[name][1]:>14}")
+    print(f"{'MB':<8}{networkx_bytes / 1e6:>14.1f}{report['bytes'] / 1e6:>14.1f}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Precompute ALT landmarks for cached TomTom graphs"
+    )
+    parser.add_argument("graphml", nargs="+", help="map_cache/*.graphml files")
+    parser.add_argument("--landmarks", type=int, default=8)
+    parser.add_argument(
+        "--report",
+        action="store_true",
+        help="only compare the memory of the networkx and compact graphs",
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    for graphml_file in args.graphml:
+        # TomTom names its graphs {place}-{mode}.graphml
+        mode = pathlib.Path(graphml_file).stem.rsplit("-", 1)[-1]
+        if mode not in SPEED_PROFILES:
+            mode = None
+        if args.report:
+            report_compaction(graphml_file, mode)
+            continue
+        graph = load_road_graph(graphml_file, mode=mode)
+        graph.build_landmarks(args.landmarks)
+        logging.info(f"Saved {args.landmarks} landmarks to {graph.cache_dir}")
@@ -0,0 +1,56 @@
+import argparse
+import pickle
+import time
+
+import numpy as np
+
+from .TomTom import TomTom
+
+METHODS = ("dijkstra", "astar", "bidirectional")
+
+
+def benchmark_routes(tom_tom, districts, n_routes=50, seed=0):
+    """
+    Route between random pairs of district centroids with every method and
+    return {method: (expanded nodes, seconds)} arrays, checking they all agree
+    """
+    _, district_nodes = tom_tom.get_district_nodes(districts)
+    rng = np.random.default_rng(seed)
+    pairs = rng.choice(district_nodes, size=(n_routes, 2))
+    methods = METHODS if tom_tom.graph.landmarks is None else METHODS + ("alt",)
+    results = {method: ([], []) for method in methods}
+    for source, target in pairs.tolist():
+        lengths = []
+        for method in methods:
+            start = time.perf_counter()
+            length, _, expanded = tom_tom.graph.search(source, target, method)
+            results[method][1].append(time.perf_counter() - start)
+            results[method][0].append(expanded)
+            lengths.append(length)
+        if not np.allclose(lengths, lengths[0]):
+            raise AssertionError(
+                f"Routes from {source} to {target} disagree: {lengths}"
+            )
+    return {
+        method: (np.array(expanded), np.array(seconds))
+        for method, (expanded, seconds) in results.items()
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare TomTom point-to-point routing methods"
+    )
+    parser.add_argument("--mode", default="walk", choices=["drive", "walk", "bike"])
+    parser.add_argument("--routes", type=int, default=50)
+    args = parser.parse_args()
+
+    districts = pickle.load(open("districts.pkl", "rb"))
+    tom_tom = TomTom(mode=args.mode, districts=districts)
+    results = benchmark_routes(tom_tom, districts, args.routes)
+    print(f"{'method':<15}{'expanded (median)':>20}{'ms (median)':>14}{'ms (p95)':>12}")
+    for method, (expanded, seconds) in results.items():
+        print(
+            f"{method:<15}{np.median(expanded):>20.0f}"
+            f"{np.median(seconds) * 1000:>14.1f}{np.percentile(seconds, 95) * 1000:>12.1f}"
+        )
@@ -1,5 +1,6 @@
 from .bills import *
 from .rent_reader import get_rent_by_district, get_burrough_by_district
+from .travel_zones import get_travel_zone
 import yfinance as yf
 from sklearn.linear_model import LinearRegression
 import pandas as pd
@@ -661,358 +662,7 @@ def predict_transport(district, transport_mode, year=0, stats=None):
     # Annual inflation rate for transport costs (estimated at 3%)
     annual_inflation_rate = 0.03
 
-    # Map London outcodes to travel zones
-    zone_mapping = {
-        # Zone 1 (Central London)
-        "EC1": 1,
-        "EC2": 1,
-        "EC3": 1,
-        "EC4": 1,
-        "WC1": 1,
-        "WC2": 1,
-        "SW1": 1,
-        "W1": 1,
-        "SE1": 1,
-        "E1W": 1,
-        "EC1A": 1,
-        "EC1M": 1,
-        "EC1N": 1,
-        "EC1P": 1,
-        "EC1R": 1,
-        "EC1V": 1,
-        "EC1Y": 1,
-        "EC2A": 1,
-        "EC2M": 1,
-        "EC2N": 1,
-        "EC2P": 1,
-        "EC2R": 1,
-        "EC2V": 1,
-        "EC2Y": 1,
-        "EC3A": 1,
-        "EC3M": 1,
-        "EC3N": 1,
-        "EC3P": 1,
-        "EC3R": 1,
-        "EC3V": 1,
-        "EC4A": 1,
-        "EC4M": 1,
-        "EC4N": 1,
-        "EC4P": 1,
-        "EC4R": 1,
-        "EC4V": 1,
-        "EC4Y": 1,
-        "WC1A": 1,
-        "WC1B": 1,
-        "WC1E": 1,
-        "WC1H": 1,
-        "WC1N": 1,
-        "WC1R": 1,
-        "WC1V": 1,
-        "WC1X": 1,
-        "WC2A": 1,
-        "WC2B": 1,
-        "WC2E": 1,
-        "WC2H": 1,
-        "WC2N": 1,
-        "WC2R": 1,
-        "SW1A": 1,
-        "SW1E": 1,
-        "SW1H": 1,
-        "SW1P": 1,
-        "SW1V": 1,
-        "SW1W": 1,
-        "SW1X": 1,
-        "SW1Y": 1,
-        "W1A": 1,
-        "W1B": 1,
-        "W1C": 1,
-        "W1D": 1,
-        "W1F": 1,
-        "W1G": 1,
-        "W1H": 1,
-        "W1J": 1,
-        "W1K": 1,
-        "W1S": 1,
-        "W1T": 1,
-        "W1U": 1,
-        "W1W": 1,
-        "SE1P": 1,
-        "N1P": 1,
-        "N1C": 1,
-        "NW1W": 1,
-        # Zone 2
-        "E1": 2,
-        "E2": 2,
-        "E3": 2,
-        "E8": 2,
-        "E9": 2,
-        "E14": 2,
-        "E15": 2,
-        "E16": 2,
-        "E20": 2,
-        "N1": 2,
-        "N5": 2,
-        "N7": 2,
-        "N16": 2,
-        "N19": 2,
-        "NW1": 2,
-        "NW3": 2,
-        "NW5": 2,
-        "NW6": 2,
-        "NW8": 2,
-        "NW10": 2,
-        "SE5": 2,
-        "SE8": 2,
-        "SE10": 2,
-        "SE11": 2,
-        "SE13": 2,
-        "SE14": 2,
-        "SE15": 2,
-        "SE16": 2,
-        "SE17": 2,
-        "SW2": 2,
-        "SW3": 2,
-        "SW4": 2,
-        "SW5": 2,
-        "SW6": 2,
-        "SW7": 2,
-        "SW8": 2,
-        "SW9": 2,
-        "SW10": 2,
-        "SW11": 2,
-        "W2": 2,
-        "W3": 2,
-        "W4": 2,
-        "W6": 2,
-        "W8": 2,
-        "W9": 2,
-        "W10": 2,
-        "W11": 2,
-        "W12": 2,
-        "W14": 2,
-        # Zone 3
-        "E4": 3,
-        "E5": 3,
-        "E6": 3,
-        "E7": 3,
-        "E10": 3,
-        "E11": 3,
-        "E12": 3,
-        "E13": 3,
-        "E17": 3,
-        "N2": 3,
-        "N4": 3,
-        "N6": 3,
-        "N8": 3,
-        "N10": 3,
-        "N15": 3,
-        "N17": 3,
-        "N18": 3,
-        "N22": 3,
-        "NW2": 3,
-        "NW4": 3,
-        "NW9": 3,
-        "NW10": 3,
-        "NW11": 3,
-        "SE2": 3,
-        "SE3": 3,
-        "SE4": 3,
-        "SE6": 3,
-        "SE7": 3,
-        "SE9": 3,
-        "SE12": 3,
-        "SE18": 3,
-        "SE19": 3,
-        "SE20": 3,
-        "SE21": 3,
-        "SE22": 3,
-        "SE23": 3,
-        "SE24": 3,
-        "SE25": 3,
-        "SE26": 3,
-        "SE27": 3,
-        "SW12": 3,
-        "SW13": 3,
-        "SW15": 3,
-        "SW16": 3,
-        "SW17": 3,
-        "SW18": 3,
-        "SW19": 3,
-        "SW20": 3,
-        "W5": 3,
-        "W7": 3,
-        "W13": 3,
-        "IG1": 3,
-        "IG2": 3,
-        "IG3": 3,
-        "IG4": 3,
-        "IG5": 3,
-        "IG6": 3,
-        "IG8": 3,
-        "IG11": 3,
-        "RM1": 3,
-        "RM2": 3,
-        "RM3": 3,
-        "RM5": 3,
-        "RM6": 3,
-        "RM7": 3,
-        "RM8": 3,
-        "RM9": 3,
-        "RM10": 3,
-        "RM11": 3,
-        "RM12": 3,
-        "RM13": 3,
-        # Zone 4
-        "E18": 4,
-        "N3": 4,
-        "N9": 4,
-        "N11": 4,
-        "N12": 4,
-        "N13": 4,
-        "N14": 4,
-        "N20": 4,
-        "N21": 4,
-        "NW7": 4,
-        "NW9": 4,
-        "NW26": 4,
-        "SE28": 4,
-        "HA0": 4,
-        "HA1": 4,
-        "HA2": 4,
-        "HA3": 4,
-        "HA4": 4,
-        "HA5": 4,
-        "HA7": 4,
-        "HA8": 4,
-        "HA9": 4,
-        "TW3": 4,
-        "TW4": 4,
-        "TW5": 4,
-        "TW7": 4,
-        "TW8": 4,
-        "TW13": 4,
-        "TW14": 4,
-        "UB1": 4,
-        "UB2": 4,
-        "UB3": 4,
-        "UB4": 4,
-        "UB5": 4,
-        "UB6": 4,
-        "UB10": 4,
-        "IG7": 4,
-        "IG9": 4,
-        "RM4": 4,
-        "RM14": 4,
-        # Zone 5
-        "BR1": 5,
-        "BR2": 5,
-        "BR3": 5,
-        "BR4": 5,
-        "BR5": 5,
-        "BR6": 5,
-        "BR7": 5,
-        "BR8": 5,
-        "CR0": 5,
-        "CR2": 5,
-        "CR3": 5,
-        "CR4": 5,
-        "CR5": 5,
-        "CR6": 5,
-        "CR7": 5,
-        "CR8": 5,
-        "CR9": 5,
-        "CR90": 5,
-        "DA1": 5,
-        "DA5": 5,
-        "DA6": 5,
-        "DA7": 5,
-        "DA8": 5,
-        "DA14": 5,
-        "DA15": 5,
-        "DA16": 5,
-        "DA17": 5,
-        "DA18": 5,
-        "EN1": 5,
-        "EN2": 5,
-        "EN3": 5,
-        "EN4": 5,
-        "EN5": 5,
-        "HA6": 5,
-        "KT1": 5,
-        "KT2": 5,
-        "KT3": 5,
-        "KT4": 5,
-        "KT5": 5,
-        "KT6": 5,
-        "KT7": 5,
-        "KT8": 5,
-        "KT9": 5,
-        "SM1": 5,
-        "SM2": 5,
-        "SM3": 5,
-        "SM4": 5,
-        "SM5": 5,
-        "SM6": 5,
-        "SM7": 5,
-        "TW1": 5,
-        "TW2": 5,
-        "TW6": 5,
-        "TW9": 5,
-        "TW10": 5,
-        "TW11": 5,
-        "TW12": 5,
-        "UB7": 5,
-        "UB8": 5,
-        "UB9": 5,
-        "UB11": 5,
-        "UB18": 5,
-        "WD6": 5,
-        "WD23": 5,
-        # Zone 6
-        "EN6": 6,
-        "EN7": 6,
-        "EN8": 6,
-        "EN9": 6,
-        "HA7": 6,
-        "KT17": 6,
-        "KT18": 6,
-        "KT19": 6,
-        "KT22": 6,
-        "RM15": 6,
-        "TN14": 6,
-        "TN16": 6,
-        "TW15": 6,
-        "TW19": 6,
-        "WD3": 6,
-        # Outside London zones (Zone 9 for our purposes)
-        "CM13": 9,
-        "CM14": 9,
-        "CM23": 9,
-        "N81": 9,
-        "SW95": 9,
-        "E98": 9,
-    }
-
-    # Extract the outcode from the district
-    # For districts like 'EC1A', we need to check both 'EC1A' and 'EC1'
-    zone = None
-    if district in zone_mapping:
-        zone = zone_mapping[district]
-    else:
-        # Try to extract the main outcode (e.g., 'EC1' from 'EC1A')
-        main_outcode = "".join([c for c in district if not c.isdigit()]) + "".join(
-            [c for c in district if c.isdigit()]
-        )
-        if main_outcode in zone_mapping:
-            zone = zone_mapping[main_outcode]
-        else:
-            # If we still can't find it, try just the letter part and first digit
-            letter_part = "".join([c for c in district if not c.isdigit()])
-            digit_part = "".join([c for c in district if c.isdigit()])
-            if digit_part:
-                simple_outcode = letter_part + digit_part[0]
-                if simple_outcode in zone_mapping:
-                    zone = zone_mapping[simple_outcode]
+    zone = get_travel_zone(district)
 
     # Default to zone 6 if we can't determine the zone
     if zone is None:
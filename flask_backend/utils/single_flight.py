@@ -0,0 +1,73 @@
+import functools
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key: the first caller does the work and
+    everyone who arrives while it is in flight waits on its future instead.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.in_flight = {}
+        self.calls = 0
+        self.coalesced = 0
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            future = self.in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self.in_flight[key] = future
+                self.calls += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self.in_flight[key]
+
+    def stats(self):
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "in_flight": len(self.in_flight),
+        }
+
+
+SINGLE_FLIGHTS = {}
+
+
+def single_flight(name):
+    """Decorator coalescing concurrent calls with identical arguments"""
+    group = SINGLE_FLIGHTS.setdefault(name, SingleFlight(name))
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = (args, tuple(sorted(kwargs.items())))
+            return group.do(key, fn, *args, **kwargs)
+
+        wrapper.single_flight = group
+        return wrapper
+
+    return decorator
+
+
+def get_single_flight_stats():
+    return {name: group.stats() for name, group in SINGLE_FLIGHTS.items()}
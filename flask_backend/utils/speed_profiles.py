@@ -0,0 +1,94 @@
+import hashlib
+import json
+import re
+from functools import lru_cache
+
+# Average speed in km/h on roads with no more specific entry, per mode
+DEFAULT_SPEEDS = {"drive": 30.0, "walk": 3.4, "bike": 17.0}
+
+# Typical London speeds in km/h by OSM highway tag, per mode
+SPEED_PROFILES = {
+    "drive": {
+        "motorway": 80.0,
+        "motorway_link": 50.0,
+        "trunk": 48.0,
+        "trunk_link": 35.0,
+        "primary": 32.0,
+        "primary_link": 28.0,
+        "secondary": 28.0,
+        "secondary_link": 25.0,
+        "tertiary": 25.0,
+        "tertiary_link": 22.0,
+        "unclassified": 22.0,
+        "residential": 20.0,
+        "living_street": 10.0,
+        "service": 12.0,
+    },
+    "bike": {
+        "cycleway": 18.0,
+        "primary": 15.0,
+        "secondary": 16.0,
+        "tertiary": 17.0,
+        "residential": 17.0,
+        "living_street": 12.0,
+        "service": 14.0,
+        "track": 12.0,
+        "path": 12.0,
+        "bridleway": 10.0,
+        "pedestrian": 8.0,
+        "footway": 8.0,
+        "steps": 2.0,
+    },
+    "walk": {
+        "steps": 2.0,
+    },
+}
+
+MPH_TO_KMH = 1.609344
+
+
+def parse_maxspeed(maxspeed):
+    """OSM maxspeed tag in km/h, e.g. '30 mph' -> 48.3, or None if not a number"""
+    match = re.match(r"\s*(\d+(?:\.\d+)?)\s*(mph)?", str(maxspeed))
+    if match is None:
+        return None
+    speed = float(match.group(1))
+    return speed * MPH_TO_KMH if match.group(2) else speed
+
+
+@lru_cache(maxsize=None)
+def _edge_speed(mode, highway, maxspeed):
+    speed = SPEED_PROFILES[mode].get(highway, DEFAULT_SPEEDS[mode])
+    if mode == "drive" and maxspeed:
+        # simplified edges can merge ways with several limits, take the lowest
+        limits = [parse_maxspeed(limit) for limit in maxspeed]
+        limits = [limit for limit in limits if limit]
+        if limits:
+            speed = min(speed, min(limits))
+    return speed
+
+
+def get_edge_speed(mode, highway, maxspeed=None):
+    """
+    Speed in km/h along an edge for mode from its OSM highway and maxspeed tags,
+    either of which may be a list where osmnx merged several ways
+    """
+    if isinstance(highway, list):
+        highway = highway[0] if highway else None
+    if maxspeed is not None and not isinstance(maxspeed, list):
+        maxspeed = [maxspeed]
+    return _edge_speed(mode, highway, tuple(maxspeed) if maxspeed else None)
+
+
+def get_speed_profile_hash(mode):
+    """
+    Hash of mode's speed table, so graphs weighted with an older table can be told
+    apart. Empty if mode is None. Changes to the rules applying the table to edges
+    are covered by bumping road_graph.GRAPH_CACHE_VERSION instead.
+    """
+    if mode is None:
+        return ""
+    profile = json.dumps(
+        [SPEED_PROFILES[mode], DEFAULT_SPEEDS[mode], MPH_TO_KMH], sort_keys=True
+    )
+    return hashlib.sha1(profile.encode()).hexdigest()
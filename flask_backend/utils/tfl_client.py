@@ -0,0 +1,165 @@
+import asyncio
+import logging
+import os
+import random
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .rate_limiter import get_rate_limiter
+from .single_flight import single_flight
+
+TFL_BASE_URL = os.environ.get("TFL_BASE_URL", "https://api.tfl.gov.uk")
+TFL_APP_ID = os.environ.get("TFL_APP_ID", "Burghandi")
+TFL_APP_KEY = os.environ.get("TFL_APP_KEY", "95598b12d85e401fbe896c199885b792")
+
+JOURNEY_PARAMS = {
+    "nationalSearch": "false",
+    "date": "20250224",
+    "time": "0900",
+    "timeIs": "Arriving",
+    "journeyPreference": "LeastWalking",
+    "alternativeCycle": "false",
+    "walkingOptimization": "true",
+    "routeBetweenEntrances": "false",
+}
+
+# Status codes worth retrying; anything else is a definitive answer
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class JourneyError(Exception):
+    pass
+
+
+class RetryableJourneyError(JourneyError):
+    pass
+
+
+def parse_journey_duration(payload):
+    """Average duration in minutes of the journeys in a JourneyResults response"""
+    journeys = payload["journeys"]
+    if len(journeys) < 1:
+        raise JourneyError("No journey found")
+
+    if journeys[0] == "walking":
+        journeys = journeys[1:]
+    journey_duration = [journey["duration"] for journey in journeys]
+
+    return round(sum(journey_duration) / len(journey_duration))
+
+
+class TfLClient:
+    """
+    TfL Journey Planner client over one pooled keep-alive session.
+    Journeys are fetched concurrently with asyncio, while a semaphore owned by the
+    client caps the requests in flight across every thread and event loop of the
+    process to max_concurrency, the size of the connection pool. Each request has
+    connect/read timeouts, and transient failures are retried with jittered
+    exponential backoff. Point base_url (or TFL_BASE_URL) at a stub server to
+    test it; python -m utils.tfl_stub checks retries, timeouts and the
+    concurrency cap against a local one.
+    """
+
+    def __init__(
+        self,
+        base_url=TFL_BASE_URL,
+        app_id=TFL_APP_ID,
+        app_key=TFL_APP_KEY,
+        max_concurrency=10,
+        timeout=(3.05, 10.0),
+        max_retries=3,
+        backoff=0.5,
+        rate_limiter="tfl",
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.params = {**JOURNEY_PARAMS, "app_id": app_id, "app_key": app_key}
+        self.max_concurrency = max_concurrency
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.rate_limiter = get_rate_limiter(rate_limiter) if rate_limiter else None
+
+        self.session = requests.Session()
+        # block rather than open throwaway connections beyond the pool
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=max_concurrency, pool_block=True
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["Accept"] = "application/json"
+
+    @single_flight("tfl_journey")
+    def _fetch_journey(self, from_lat, from_lon, to_lat, to_lon, max_wait):
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(max_wait)
+        url = f"{self.base_url}/Journey/JourneyResults/{from_lat},{from_lon}/to/{to_lat},{to_lon}"
+        try:
+            with self.slots:
+                r = self.session.get(url, params=self.params, timeout=self.timeout)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            raise RetryableJourneyError(f"Request to TfL failed: {e}") from e
+
+        if r.status_code in RETRY_STATUS_CODES:
+            raise RetryableJourneyError(
+                f"Failed to get journey: from {from_lat},{from_lon} to {to_lat},{to_lon} with status code {r.status_code}"
+            )
+        if r.status_code != 200:
+            raise JourneyError(
+                f"Failed to get journey: from {from_lat},{from_lon} to {to_lat},{to_lon} with status code {r.status_code}"
+            )
+        try:
+            return parse_journey_duration(r.json())
+        except JourneyError:
+            raise JourneyError(
+                f"No journey found: from {from_lat},{from_lon} to {to_lat},{to_lon}"
+            )
+
+    async def get_journey(self, from_lat, from_lon, to_lat, to_lon, max_wait=None):
+        """Journey minutes for one trip, retrying transient failures"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await asyncio.to_thread(
+                    self._fetch_journey,
+                    from_lat,
+                    from_lon,
+                    to_lat,
+                    to_lon,
+                    max_wait,
+                )
+            except RetryableJourneyError as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = random.uniform(0, self.backoff * 2**attempt)
+                logging.info(f"{e}, retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    async def get_journeys(self, trips, max_wait=None):
+        """
+        Journey minutes for every (from_lat, from_lon, to_lat, to_lon) trip, fetched
+        concurrently. Failed trips come back as their exception.
+        """
+        return await asyncio.gather(
+            *(self.get_journey(*trip, max_wait=max_wait) for trip in trips),
+            return_exceptions=True,
+        )
+
+    def get_journeys_sync(self, trips, max_wait=None):
+        """Blocking wrapper around get_journeys for the Flask request handlers"""
+        return asyncio.run(self.get_journeys(trips, max_wait=max_wait))
+
+
+_tfl_client = None
+_tfl_client_lock = threading.Lock()
+
+
+def get_tfl_client():
+    """Return the shared TfLClient, so every request reuses its connection pool"""
+    global _tfl_client
+    if _tfl_client is None:
+        with _tfl_client_lock:
+            if _tfl_client is None:
+                _tfl_client = TfLClient()
+    return _tfl_client
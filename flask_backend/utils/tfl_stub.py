@@ -0,0 +1,174 @@
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .tfl_client import JourneyError, TfLClient
+
+STUB_MINUTES = 20
+
+
+class StubTfLServer:
+    """
+    Local stand-in for the TfL Journey Planner. Every journey takes STUB_MINUTES
+    after delay seconds, except that the first failures requests for each URL
+    get a 503. Counts requests and the most ever in flight at once.
+    """
+
+    def __init__(self, delay=0.0, failures=0):
+        self.delay = delay
+        self.failures = failures
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.attempts = {}
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                with stub._lock:
+                    stub.requests += 1
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                    attempt = stub.attempts.get(self.path, 0)
+                    stub.attempts[self.path] = attempt + 1
+                try:
+                    time.sleep(stub.delay)
+                    if attempt < stub.failures:
+                        self._reply(503, {})
+                    else:
+                        self._reply(200, {"journeys": [{"duration": STUB_MINUTES}]})
+                finally:
+                    with stub._lock:
+                        stub.in_flight -= 1
+
+            def _reply(self, status, payload):
+                body = json.dumps(payload).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    # the client gave up on a slow reply
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def make_trips(n_trips, offset=0):
+    """Distinct trips, so single flight never merges them"""
+    return [
+        (51.5, -0.1, 51.5 + (offset * n_trips + i) * 1e-4, -0.1) for i in range(n_trips)
+    ]
+
+
+def check_retries():
+    """Transient 503s are retried until the journey comes back"""
+    with StubTfLServer(failures=2) as stub:
+        client = TfLClient(
+            base_url=stub.url, max_retries=3, backoff=0.01, rate_limiter=None
+        )
+        result = client.get_journeys_sync(make_trips(1))[0]
+        if result != STUB_MINUTES or stub.requests != 3:
+            raise AssertionError(
+                f"Expected {STUB_MINUTES} minutes after 3 requests, got {result!r} after {stub.requests}"
+            )
+    return f"503 retried: {stub.requests} requests"
+
+
+def check_timeouts():
+    """A reply slower than the read timeout fails once the retries run out"""
+    with StubTfLServer(delay=0.5) as stub:
+        client = TfLClient(
+            base_url=stub.url,
+            timeout=(1.0, 0.1),
+            max_retries=1,
+            backoff=0.01,
+            rate_limiter=None,
+        )
+        start = time.perf_counter()
+        result = client.get_journeys_sync(make_trips(1))[0]
+        seconds = time.perf_counter() - start
+        if not isinstance(result, JourneyError) or stub.requests != 2:
+            raise AssertionError(
+                f"Expected a JourneyError after 2 requests, got {result!r} after {stub.requests}"
+            )
+    return f"read timeout: gave up after {stub.requests} requests in {seconds:.2f}s"
+
+
+def check_concurrency(max_concurrency=4, n_callers=5, n_trips=20):
+    """Concurrent callers, each with its own event loop, share one cap"""
+    with StubTfLServer(delay=0.05) as stub:
+        client = TfLClient(
+            base_url=stub.url, max_concurrency=max_concurrency, rate_limiter=None
+        )
+        results = []
+        callers = [
+            threading.Thread(
+                target=lambda k=k: results.extend(
+                    client.get_journeys_sync(make_trips(n_trips, k))
+                )
+            )
+            for k in range(n_callers)
+        ]
+        for caller in callers:
+            caller.start()
+        for caller in callers:
+            caller.join()
+        if results != [STUB_MINUTES] * n_callers * n_trips:
+            raise AssertionError(f"Expected every journey to succeed, got {results}")
+        if stub.max_in_flight > max_concurrency:
+            raise AssertionError(
+                f"{stub.max_in_flight} requests in flight, more than {max_concurrency}"
+            )
+    return (
+        f"concurrency cap: at most {stub.max_in_flight} of {max_concurrency} in flight"
+    )
+
+
+CHECKS = {
+    "retries": check_retries,
+    "timeouts": check_timeouts,
+    "concurrency": check_concurrency,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Check TfLClient retries, timeouts and concurrency against a local stub server"
+    )
+    parser.add_argument(
+        "--check",
+        action="append",
+        choices=list(CHECKS),
+        help="run only this check, may be repeated",
+    )
+    args = parser.parse_args()
+    for name in args.check or CHECKS:
+        print(CHECKS[name]())
@@ -0,0 +1,125 @@
+import numpy as np
+import logging
+import os
+import pathlib
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+
+from .district_index import get_districts_fingerprint
+from .public_transport_reader import get_journey
+
+# Sentinel minutes values; real journeys are always shorter than these
+NOT_COMPUTED = np.iinfo(np.uint16).max
+NO_JOURNEY = NOT_COMPUTED - 1
+MAX_MINUTES = NO_JOURNEY - 1
+
+
+def get_travel_matrix_files(districts):
+    cache_path = pathlib.Path(__file__).parent.resolve() / "map_cache"
+    name = f"travel_matrix-{get_districts_fingerprint(districts)[:12]}"
+    return cache_path / f"{name}.npy", cache_path / f"{name}.keys.npy"
+
+
+class TravelMatrix:
+    """
+    Read-only, memory-mapped N x N matrix of public transport minutes between
+    district centroids, as written by build_travel_matrix.
+    """
+
+    def __init__(self, matrix_file, keys_file):
+        self.keys = np.load(keys_file, allow_pickle=False)
+        self.positions = {key: i for i, key in enumerate(self.keys.tolist())}
+        self.minutes = np.load(matrix_file, mmap_mode="r")
+
+    def __contains__(self, district):
+        return district in self.positions
+
+    def is_complete(self, district):
+        return not np.any(self.minutes[self.positions[district]] == NOT_COMPUTED)
+
+    def reachable(self, district, max_travel_time):
+        """Return {district: minutes} for every district reachable within max_travel_time"""
+        row = self.minutes[self.positions[district]]
+        mask = row <= min(float(max_travel_time), MAX_MINUTES)
+        return dict(zip(self.keys[mask].tolist(), row[mask].tolist()))
+
+
+def load_travel_matrix(districts):
+    """Open the travel matrix for this district set, or return None if it was never built"""
+    matrix_file, keys_file = get_travel_matrix_files(districts)
+    if not os.path.exists(matrix_file) or not os.path.exists(keys_file):
+        return None
+    return TravelMatrix(matrix_file, keys_file)
+
+
+def build_travel_matrix(districts, max_workers=10, flush_every=100, retry_failed=False):
+    """
+    Fill the all-pairs travel matrix with TfL journey times.
+    Progress is flushed to the memory-mapped file as it goes, so an interrupted build
+    resumes from the pairs that are still NOT_COMPUTED (and NO_JOURNEY if retry_failed).
+    """
+    matrix_file, keys_file = get_travel_matrix_files(districts)
+    os.makedirs(matrix_file.parent, exist_ok=True)
+    keys = list(districts.keys())
+    n = len(keys)
+
+    if os.path.exists(matrix_file):
+        logging.info(f"Resuming travel matrix from {matrix_file}")
+        minutes = np.load(matrix_file, mmap_mode="r+")
+    else:
+        logging.info(f"Creating travel matrix for {n} districts")
+        np.save(keys_file, np.array(keys, dtype=str))
+        minutes = np.lib.format.open_memmap(
+            matrix_file, mode="w+", dtype=np.uint16, shape=(n, n)
+        )
+        minutes[:] = NOT_COMPUTED
+        np.fill_diagonal(minutes, 0)
+        minutes.flush()
+
+    # Only one-way journeys, assuming the return journey takes the same time
+    rows, cols = np.triu_indices(n, k=1)
+    pending = minutes[rows, cols] == NOT_COMPUTED
+    if retry_failed:
+        pending |= minutes[rows, cols] == NO_JOURNEY
+    pairs = list(zip(rows[pending].tolist(), cols[pending].tolist()))
+    logging.info(f"{len(pairs)} of {len(rows)} journeys left to calculate")
+
+    def get_journey_for_pair(pair):
+        i, j = pair
+        try:
+            # offline, so wait as long as the shared TfL rate limiter needs
+            journey_duration = get_journey(
+                districts[keys[i]]["latitude"],
+                districts[keys[i]]["longitude"],
+                districts[keys[j]]["latitude"],
+                districts[keys[j]]["longitude"],
+                max_wait=float("inf"),
+            )
+            return i, j, min(journey_duration, MAX_MINUTES)
+        except Exception as e:
+            logging.error(f"Error calculating journey from {keys[i]} to {keys[j]}: {e}")
+            return i, j, NO_JOURNEY
+
+    completed = 0
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        for i, j, journey_duration in executor.map(get_journey_for_pair, pairs):
+            minutes[i, j] = minutes[j, i] = journey_duration
+            completed += 1
+            if completed % flush_every == 0:
+                minutes.flush()
+                logging.info(
+                    f"Completed: {completed}/{len(pairs)} ({completed/len(pairs)*100:.2f}%)"
+                )
+    finally:
+        # on interruption, drop the queued journeys rather than waiting for them
+        executor.shutdown(wait=True, cancel_futures=True)
+        minutes.flush()
+
+    logging.info("Travel matrix complete")
+    return load_travel_matrix(districts)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    build_travel_matrix(pickle.load(open("districts.pkl", "rb")))
@@ -0,0 +1,155 @@
+import numpy as np
+import logging
+
+from sklearn.ensemble import GradientBoostingRegressor
+from sklearn.model_selection import train_test_split
+
+from .district_index import haversine_km
+from .rent_reader import get_burrough_index
+from .reverse_geocoder import get_reverse_geocoder
+from .travel_matrix import NO_JOURNEY
+from .travel_zones import get_travel_zone
+
+# Zone used for districts outside the zone table, as in predict_transport
+DEFAULT_ZONE = 6
+MIN_TRAINING_SAMPLES = 200
+MAX_TRAINING_SAMPLES = 20000
+
+
+class TravelTimeSurrogate:
+    """
+    Gradient-boosted estimate of public transport minutes from straight-line
+    distance, the travel zones of both ends and whether they share a borough.
+    error_bound is the 95th percentile absolute error on held-out journeys.
+    """
+
+    def __init__(self, districts, model, error_bound, n_samples):
+        self.districts = districts
+        self.model = model
+        self.error_bound = error_bound
+        self.n_samples = n_samples
+        self._zones = {}
+        self._burroughs = {}
+
+    def _zone(self, district):
+        zone = self._zones.get(district)
+        if zone is None:
+            zone = get_travel_zone(district) if district else None
+            zone = self._zones[district] = DEFAULT_ZONE if zone is None else zone
+        return zone
+
+    def _burrough(self, district):
+        if district not in self._burroughs:
+            burroughs = get_burrough_index().get(district)
+            self._burroughs[district] = burroughs[0] if burroughs else None
+        return self._burroughs[district]
+
+    def features(self, from_lats, from_lons, from_districts, to_districts):
+        to_lats = np.array([float(self.districts[d]["latitude"]) for d in to_districts])
+        to_lons = np.array(
+            [float(self.districts[d]["longitude"]) for d in to_districts]
+        )
+        distance = haversine_km(
+            np.asarray(from_lats, dtype=float),
+            np.asarray(from_lons, dtype=float),
+            to_lats,
+            to_lons,
+        )
+        from_zones = np.array([self._zone(d) for d in from_districts])
+        to_zones = np.array([self._zone(d) for d in to_districts])
+        same_burrough = np.array(
+            [
+                self._burrough(a) is not None and self._burrough(a) == self._burrough(b)
+                for a, b in zip(from_districts, to_districts)
+            ]
+        )
+        return np.column_stack(
+            [
+                distance,
+                from_zones,
+                to_zones,
+                np.abs(from_zones - to_zones),
+                same_burrough,
+            ]
+        )
+
+    def estimate(self, from_lats, from_lons, from_districts, to_districts):
+        """Estimated minutes for each journey; true values are within ±error_bound 95% of the time"""
+        return self.model.predict(
+            self.features(from_lats, from_lons, from_districts, to_districts)
+        )
+
+    @classmethod
+    def train(cls, districts, observations, random_state=0):
+        """
+        Fit the surrogate on (from_lat, from_lon, from_district, to_district, minutes)
+        observations. Returns None when there are too few of them to trust.
+        """
+        observations = [
+            o for o in observations if o[2] in districts and o[3] in districts
+        ]
+        if len(observations) < MIN_TRAINING_SAMPLES:
+            logging.info(
+                f"Only {len(observations)} observed journeys, not training travel time surrogate"
+            )
+            return None
+        rng = np.random.default_rng(random_state)
+        if len(observations) > MAX_TRAINING_SAMPLES:
+            keep = rng.choice(len(observations), MAX_TRAINING_SAMPLES, replace=False)
+            observations = [observations[i] for i in keep]
+
+        from_lats, from_lons, from_districts, to_districts, minutes = zip(*observations)
+        surrogate = cls(districts, None, None, len(observations))
+        X = surrogate.features(from_lats, from_lons, from_districts, to_districts)
+        y = np.asarray(minutes, dtype=float)
+
+        X_train, X_test, y_train, y_test = train_test_split(
+            X, y, test_size=0.2, random_state=random_state
+        )
+        model = GradientBoostingRegressor(
+            n_estimators=100, max_depth=3, random_state=random_state
+        )
+        model.fit(X_train, y_train)
+        surrogate.error_bound = float(
+            np.percentile(np.abs(model.predict(X_test) - y_test), 95)
+        )
+        # refit on everything now that the error bound is measured
+        surrogate.model = model.fit(X, y)
+        logging.info(
+            f"Trained travel time surrogate on {len(y)} journeys, error bound ±{surrogate.error_bound:.1f} min"
+        )
+        return surrogate
+
+
+def collect_observed_journeys(districts, travel_matrix=None, journey_cache=None):
+    """
+    Gather (from_lat, from_lon, from_district, to_district, minutes) for every
+    journey already fetched from TfL, from the travel matrix and the journey cache
+    """
+    observations = []
+    if travel_matrix is not None:
+        minutes = np.asarray(travel_matrix.minutes)
+        rows, cols = np.nonzero(
+            (minutes < NO_JOURNEY) & ~np.eye(len(minutes), dtype=bool)
+        )
+        keys = travel_matrix.keys.tolist()
+        for i, j in zip(rows.tolist(), cols.tolist()):
+            if keys[i] in districts:
+                observations.append(
+                    (
+                        float(districts[keys[i]]["latitude"]),
+                        float(districts[keys[i]]["longitude"]),
+                        keys[i],
+                        keys[j],
+                        int(minutes[i, j]),
+                    )
+                )
+
+    if journey_cache is not None:
+        cached = list(journey_cache.observations())
+        reverse_geocoder = get_reverse_geocoder()
+        if cached and reverse_geocoder is not None:
+            lats, lons, destinations, cached_minutes = zip(*cached)
+            origins = reverse_geocoder.lookup(lats, lons).tolist()
+            observations.extend(zip(lats, lons, origins, destinations, cached_minutes))
+    return observations
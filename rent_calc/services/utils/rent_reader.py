@@ -1,12 +1,101 @@
+import numpy as np
 import pandas as pd
 import requests
+import hashlib
+import os
+import pathlib
 
-def get_rent_data(file_path = 'data/rent_data.xlsx'):
+RENT_DATA_PATH = 'data/rent_data.xlsx'
+RENT_CACHE_VERSION = 1
+TEXT_COLUMNS = ['Category']
+NUMERIC_COLUMNS = ['Count', 'Mean', 'LowerQ', 'Median', 'UpperQ']
+
+_rent_tables = {}
+
+def parse_rent_data(file_path = RENT_DATA_PATH):
     raw_data = pd.ExcelFile(file_path)
     district_data = raw_data.parse('3', skiprows=2, names=['District', 'Category', 'Count', 'Mean', 'LowerQ', 'Median', 'UpperQ'])
     burrough_data = raw_data.parse('2', skiprows=2, names=['Burrough', 'Category', 'Count', 'Mean', 'LowerQ', 'Median', 'UpperQ'])
     return district_data, burrough_data
 
+def get_file_hash(file_path):
+    sha = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+def get_rent_cache_file(file_path = RENT_DATA_PATH):
+    cache_path = pathlib.Path(__file__).parent.resolve() / 'rent_cache'
+    return cache_path / f"{pathlib.Path(file_path).stem}.npz"
+
+def _table_to_columns(prefix, data, key):
+    # '..' placeholders become NaN so every column has a fixed dtype
+    columns = {f'{prefix}_{key}': data[key].fillna('').to_numpy(dtype=str)}
+    for column in TEXT_COLUMNS:
+        columns[f'{prefix}_{column}'] = data[column].fillna('').to_numpy(dtype=str)
+    for column in NUMERIC_COLUMNS:
+        columns[f'{prefix}_{column}'] = pd.to_numeric(data[column], errors='coerce').to_numpy(dtype=np.float64)
+    return columns
+
+def _columns_to_table(prefix, columns, key):
+    names = [key] + TEXT_COLUMNS + NUMERIC_COLUMNS
+    return pd.DataFrame({name: columns[f'{prefix}_{name}'] for name in names})
+
+def build_rent_cache(file_path = RENT_DATA_PATH, cache_file = None):
+    """
+    Parse the rent workbook and write the cleaned district and burrough tables
+    to a columnar .npz file, tagged with the workbook's mtime and hash.
+    """
+    if cache_file is None:
+        cache_file = get_rent_cache_file(file_path)
+    os.makedirs(pathlib.Path(cache_file).parent, exist_ok=True)
+
+    district_data, burrough_data = parse_rent_data(file_path)
+    columns = {
+        **_table_to_columns('district', district_data, 'District'),
+        **_table_to_columns('burrough', burrough_data, 'Burrough'),
+    }
+    # named per process so workers starting together never share a tmp file
+    tmp_file = f'{cache_file}.{os.getpid()}.tmp.npz'
+    np.savez(tmp_file, version=RENT_CACHE_VERSION, source_mtime=os.stat(file_path).st_mtime_ns, source_hash=get_file_hash(file_path), **columns)
+    os.replace(tmp_file, cache_file)
+    return columns
+
+def load_rent_cache(file_path = RENT_DATA_PATH, cache_file = None):
+    """
+    Load the cleaned rent columns from the .npz cache, rebuilding it only when the
+    workbook's mtime and content hash no longer match the cached ones.
+    """
+    if cache_file is None:
+        cache_file = get_rent_cache_file(file_path)
+    if os.path.exists(cache_file):
+        try:
+            with np.load(cache_file, allow_pickle=False) as cache:
+                if int(cache['version']) == RENT_CACHE_VERSION and (
+                    int(cache['source_mtime']) == os.stat(file_path).st_mtime_ns
+                    or str(cache['source_hash']) == get_file_hash(file_path)
+                ):
+                    return {name: cache[name] for name in cache.files}
+        except Exception as e:
+            print(f"Error loading rent cache: {e}")
+    return build_rent_cache(file_path, cache_file)
+
+def get_rent_data(file_path = RENT_DATA_PATH):
+    """
+    District and burrough rent tables, loaded once per process and only re-read
+    when the workbook changes. These are the cleaned cached tables rather than
+    the sheets as parsed: '..' placeholders in the numeric columns are NaN, the
+    numeric columns are float64, and missing names or categories are ''.
+    """
+    mtime = os.stat(file_path).st_mtime_ns
+    cached = _rent_tables.get(file_path)
+    if cached is None or cached[0] != mtime:
+        columns = load_rent_cache(file_path)
+        cached = (mtime, _columns_to_table('district', columns, 'District'), _columns_to_table('burrough', columns, 'Burrough'))
+        _rent_tables[file_path] = cached
+    return cached[1], cached[2]
+
 def get_burrough_by_district(district):
     url = f"https://api.postcodes.io/outcodes/{district}"
     